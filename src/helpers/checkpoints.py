@@ -0,0 +1,128 @@
+"""Checkpoints of objects passed between stages of `run_it`.
+
+Objects with records grouped per district, `{district: [records]}` or
+`{district: {subdistrict: [records]}}` (e.g. votes_data_per_district), are
+saved with `per_district=True` into `<name>.ckpt` directory: one
+gzip-compressed JSON lines file per (sub)district plus `index.json`.
+Records are written one by one, so the object is never serialised into one
+big string, and it is loaded lazily: a district is read from disk only when
+it is accessed. Other objects (e.g. small mappings) are saved as plain JSON
+files.
+
+Loaded checkpoint is read-only, changes of loaded districts are not kept
+(see `LazyCheckpoint`).
+
+Example of usage:
+
+    checkpoints.save(filepath, votes_data_per_district, per_district=True)
+    votes_data_per_district = checkpoints.load(filepath)
+    for district, votes in votes_data_per_district.items():
+        ...  # only votes of one district are in memory
+"""
+
+import gzip
+import json
+import os
+import shutil
+from collections.abc import Mapping
+
+import helpers.utilities as utils
+
+CHECKPOINT_EXT = ".ckpt"
+INDEX_FILE_NAME = "index.json"
+CHECKPOINT_VERSION = 1
+COMPRESS_LEVEL = 3
+
+
+def get_checkpoint_dir(filepath):
+    """Checkpoint directory for JSON file path (`create_json_filepath`)."""
+    return os.path.splitext(filepath)[0] + CHECKPOINT_EXT
+
+
+def _write_records(checkpoint_dir, records):
+    file_name = f"{len(os.listdir(checkpoint_dir)):04d}.jsonl.gz"
+    path = os.path.join(checkpoint_dir, file_name)
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=COMPRESS_LEVEL) as file_:
+        for record in records:
+            file_.write(
+                json.dumps(
+                    record, ensure_ascii=False, default=utils.to_json_serializable
+                )
+            )
+            file_.write("\n")
+    return file_name
+
+
+def _read_records(checkpoint_dir, file_name):
+    path = os.path.join(checkpoint_dir, file_name)
+    with gzip.open(path, "rt", encoding="utf-8") as file_:
+        return [json.loads(line) for line in file_]
+
+
+def save(filepath, obj, per_district=False):
+    """Save object with records grouped per district as checkpoint, other
+    objects as JSON file. Checkpoint takes precedence over JSON file with
+    the same name in `load`."""
+    checkpoint_dir = get_checkpoint_dir(filepath)
+    if not per_district:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        utils.save_dict_as_json(obj, filepath)
+        return
+
+    tmp_dir = f"{checkpoint_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    districts = {}
+    for district, value in obj.items():
+        if isinstance(value, dict):
+            districts[district] = {
+                subdistrict: _write_records(tmp_dir, records)
+                for subdistrict, records in value.items()
+            }
+        else:
+            districts[district] = _write_records(tmp_dir, value)
+    index = {"version": CHECKPOINT_VERSION, "districts": districts}
+    with open(os.path.join(tmp_dir, INDEX_FILE_NAME), "w", encoding="utf-8") as file_:
+        json.dump(index, file_, ensure_ascii=False)
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    os.replace(tmp_dir, checkpoint_dir)
+
+
+def load(filepath):
+    """Load object saved with `save`, checkpoint is loaded lazily."""
+    checkpoint_dir = get_checkpoint_dir(filepath)
+    if os.path.isdir(checkpoint_dir):
+        return LazyCheckpoint(checkpoint_dir)
+    return utils.load_json_obj(filepath)
+
+
+class LazyCheckpoint(Mapping):
+    """Read-only `{district: records}` mapping, a district is loaded from
+    disk every time it is accessed (it is not kept in memory).
+
+    Every access returns new records, so changes made to them are lost;
+    copy a district (or the whole mapping with `dict()`) to modify it."""
+
+    def __init__(self, checkpoint_dir):
+        self.checkpoint_dir = checkpoint_dir
+        path = os.path.join(checkpoint_dir, INDEX_FILE_NAME)
+        with open(path, encoding="utf-8") as file_:
+            self.districts = json.load(file_)["districts"]
+
+    def __getitem__(self, district):
+        entry = self.districts[district]
+        if isinstance(entry, dict):
+            return {
+                subdistrict: _read_records(self.checkpoint_dir, file_name)
+                for subdistrict, file_name in entry.items()
+            }
+        return _read_records(self.checkpoint_dir, entry)
+
+    def __contains__(self, district):
+        return district in self.districts
+
+    def __iter__(self):
+        return iter(self.districts)
+
+    def __len__(self):
+        return len(self.districts)
@@ -0,0 +1,204 @@
+"""On-disk cache of scraped pages, in `data/<city>/.http_cache`.
+
+Responses (200 only) are stored content-addressed: body in
+`objects/<sha256 of body>` and `entries/<sha256 of url>.json` with url,
+ETag / Last-Modified and time of download. A fresh entry (younger than
+`ttl`) is served without network, a stale one is revalidated with a
+conditional request (304 -> cached body is used again).
+
+Cache is limited to `max_size` bytes, least recently used entries are
+removed first. In `offline` mode pages are served only from cache (also
+stale ones) and a missing page raises OfflineCacheMiss, so a re-run of a
+city is local-only and reproducible. Settings are in `settings.http_cache`.
+
+Example of usage (scrapers, `self.http_cache` is defined in BaseConfig):
+
+    soup = utils.get_soup(url, cache=self.http_cache)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from helpers import settings
+
+CACHE_DIR_NAME = ".http_cache"
+
+
+class OfflineCacheMiss(RuntimeError):
+    pass
+
+
+class CachedResponse:
+    """Part of `requests.Response` API used by scrapers."""
+
+    def __init__(self, url, content, headers, from_cache=True):
+        self.url = url
+        self.status_code = 200
+        self.content = content
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as file_:
+        file_.write(data)
+    os.replace(tmp_path, path)
+
+
+class HTTPCache:
+    def __init__(self, path, ttl=7 * 24 * 3600, max_size=512 * 1024**2, offline=False):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.offline = offline
+        self.entries_dir = os.path.join(path, "entries")
+        self.objects_dir = os.path.join(path, "objects")
+        self.lock = threading.Lock()
+        self.total_size = None
+
+    def entry_path(self, url):
+        return os.path.join(self.entries_dir, f"{_sha256(url.encode('utf-8'))}.json")
+
+    def lookup(self, url):
+        try:
+            with open(self.entry_path(url), encoding="utf-8") as file_:
+                entry = json.load(file_)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not os.path.exists(os.path.join(self.objects_dir, entry["body"])):
+            return None
+        return entry
+
+    def is_fresh(self, entry):
+        return self.ttl is not None and time.time() - entry["fetched_at"] < self.ttl
+
+    def validators(self, entry):
+        """Headers of conditional request revalidating the entry."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def response(self, entry):
+        """Response with cached body, entry is marked as recently used.
+        Returns None if the body was removed since `lookup` (cache miss)."""
+        try:
+            with open(os.path.join(self.objects_dir, entry["body"]), "rb") as file_:
+                content = file_.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(self.entry_path(entry["url"]))
+        except FileNotFoundError:
+            pass
+        headers = {"Content-Type": entry.get("content_type", "")}
+        return CachedResponse(entry["url"], content, headers)
+
+    def refresh(self, entry):
+        """Entry was revalidated (304), it is fresh again."""
+        entry["fetched_at"] = time.time()
+        self.write_entry(entry)
+
+    def store(self, url, response):
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.objects_dir, exist_ok=True)
+        body = _sha256(response.content)
+        object_path = os.path.join(self.objects_dir, body)
+        entry = {
+            "url": url,
+            "body": body,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type", ""),
+            "fetched_at": time.time(),
+        }
+        # body and its entry are written together, so `evict` does not see
+        # the body without entry (unused) or the entry without body
+        with self.lock:
+            added_size = 0
+            if not os.path.exists(object_path):
+                _write_atomic(object_path, response.content)
+                added_size = len(response.content)
+            self.write_entry(entry)
+            if self.total_size is None:
+                self.total_size = self.get_objects_size()
+            else:
+                self.total_size += added_size
+            if self.total_size > self.max_size:
+                self.evict()
+
+    def write_entry(self, entry):
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        _write_atomic(self.entry_path(entry["url"]), data)
+
+    def get_objects_size(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.objects_dir))
+
+    def remove_object(self, body):
+        try:
+            os.remove(os.path.join(self.objects_dir, body))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Remove bodies which are not used by any entry (e.g. old versions
+        of changed pages), then least recently used entries until cache
+        takes 90% of `max_size`. Called with `self.lock` held."""
+        entries = sorted(
+            os.scandir(self.entries_dir), key=lambda entry: entry.stat().st_mtime
+        )
+        used_bodies = {}
+        for entry_file in entries:
+            try:
+                with open(entry_file.path, encoding="utf-8") as file_:
+                    used_bodies[entry_file.path] = json.load(file_)["body"]
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+        body_users = {}
+        for body in used_bodies.values():
+            body_users[body] = body_users.get(body, 0) + 1
+        object_sizes = {}
+        for object_file in os.scandir(self.objects_dir):
+            if object_file.name in body_users:
+                object_sizes[object_file.name] = object_file.stat().st_size
+            elif not object_file.name.endswith(".tmp"):
+                self.remove_object(object_file.name)
+        self.total_size = sum(object_sizes.values())
+
+        target_size = 0.9 * self.max_size
+        for entry_path, body in used_bodies.items():
+            if self.total_size <= target_size:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                continue
+            body_users[body] -= 1
+            if body_users[body] == 0:
+                self.total_size -= object_sizes.get(body, 0)
+                self.remove_object(body)
+
+
+_caches = {}
+
+
+def get_cache(unit):
+    """Shared cache of the city (`data/<unit>/.http_cache`)."""
+    if unit not in _caches:
+        path = settings.get_path_to_excel_files(unit, extra_dir=CACHE_DIR_NAME)
+        _caches[unit] = HTTPCache(path, **settings.http_cache)
+    return _caches[unit]
@@ -0,0 +1,169 @@
+"""Shared HTTP fetcher for city scrapers.
+
+One pooled `requests.Session` is reused for all requests. Requests have a
+timeout and are retried with exponential backoff on connection errors,
+429 and 5xx responses. Number of concurrent requests per host is bounded
+and requests to the same host are spaced by `min_interval` seconds, so
+scrapers stay polite to city portals.
+
+Batches of URLs are fetched in threads and results are yielded as they
+complete:
+
+    fetcher = http_fetcher.get_fetcher()
+    for url, response in fetcher.fetch_all(urls):
+        soup = utils.make_soup(response.content)
+
+Limits are set in `settings.http_fetcher`.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from helpers import http_cache, settings
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HostLimiter:
+    """Bounded concurrency and minimal interval between requests to a host."""
+
+    def __init__(self, max_connections, min_interval):
+        self.semaphore = threading.BoundedSemaphore(max_connections)
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.next_request_time = 0.0
+
+    def __enter__(self):
+        self.semaphore.acquire()
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_request_time - now
+            self.next_request_time = max(now, self.next_request_time)
+            self.next_request_time += self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.semaphore.release()
+
+
+class HTTPFetcher:
+    def __init__(
+        self,
+        max_workers=8,
+        max_per_host=4,
+        pool_connections=4,
+        min_interval=0.1,
+        retries=3,
+        backoff=0.5,
+        timeout=30,
+    ):
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=max_workers
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.limiters = {}
+        self.limiters_lock = threading.Lock()
+
+    def get_limiter(self, url):
+        host = urlsplit(url).netloc
+        with self.limiters_lock:
+            if host not in self.limiters:
+                self.limiters[host] = HostLimiter(self.max_per_host, self.min_interval)
+            return self.limiters[host]
+
+    def get(self, url, cache=None, **kwargs):
+        """GET url, retried on connection errors and RETRY_STATUSES. As with
+        `requests.get`, response with error status is returned (the last one
+        if all retries failed). With `cache` (`http_cache.HTTPCache`) fresh
+        pages are not downloaded and stale ones are revalidated."""
+        if cache is None:
+            return self.download(url, **kwargs)
+        entry = cache.lookup(url)
+        if entry and (cache.offline or cache.is_fresh(entry)):
+            response = cache.response(entry)
+            if response is not None:
+                return response
+            # body was evicted since lookup
+            entry = None
+        if cache.offline:
+            raise http_cache.OfflineCacheMiss(f"Page not cached (offline): {url}")
+        headers = kwargs.get("headers", {})
+        if entry:
+            kwargs["headers"] = {**headers, **cache.validators(entry)}
+        response = self.download(url, **kwargs)
+        if entry and response.status_code == 304:
+            cached = cache.response(entry)
+            if cached is not None:
+                cache.refresh(entry)
+                return cached
+            # body was evicted since lookup, download it without validators
+            kwargs["headers"] = headers
+            response = self.download(url, **kwargs)
+        if response.status_code == 200:
+            cache.store(url, response)
+        return response
+
+    def download(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        limiter = self.get_limiter(url)
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            response = None
+            try:
+                with limiter:
+                    response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    return response
+            time.sleep(self.retry_delay(attempt, response))
+
+    def retry_delay(self, attempt, response=None):
+        retry_after = response is not None and response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * 2**attempt
+
+    def fetch_all(self, urls, cache=None):
+        """Fetch urls in threads, yield `(url, response)` pairs as they
+        complete (not in order of urls). Connection error of any request is
+        raised."""
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.get, url, cache): url for url in urls}
+            try:
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+
+_fetcher = None
+
+
+def get_fetcher():
+    """Shared fetcher (one session for the process)."""
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = HTTPFetcher(**settings.http_fetcher)
+    return _fetcher
@@ -0,0 +1,227 @@
+"""Binary cache sidecar for parsed .pb files.
+
+Parsed file is stored in `.pb_cache/<filename>/` directory next to the
+.pb file as plain `.npy` arrays (no pickle) plus `index.json` with META,
+PROJECTS and the cache key: file size, mtime and sha256 of the content.
+Ballots are stored in CSR form (see `helpers.tally`), other VOTES columns
+as utf-8 blobs, so loading is a memory-map instead of a CSV parse.
+
+`PBFile.load(cache=True)` uses the memory-mapped arrays directly.
+`utils.load_pb_file(cache=True)` (e.g. `ModifyPBFiles(use_cache=True)`)
+only saves the CSV parse: it still returns a dict per voter, so its memory
+use is the same as without cache.
+
+Cache directory is limited to `settings.pb_cache_max_size` bytes, least
+recently used entries are removed first.
+
+Example of usage:
+
+    meta, projects, votes, _, _ = utils.load_pb_file(pb_file, cache=True)
+    pb = PBFile.load(pb_file, cache=True)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from helpers import settings, tally
+
+CACHE_DIR_NAME = ".pb_cache"
+INDEX_FILE_NAME = "index.json"
+SEPARATOR = "\x1f"
+CACHE_VERSION = 1
+
+
+def get_entry_dir(pb_file):
+    pb_file = os.path.abspath(pb_file)
+    cache_dir = os.path.join(os.path.dirname(pb_file), CACHE_DIR_NAME)
+    return os.path.join(cache_dir, os.path.basename(pb_file))
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file_:
+        while chunk := file_.read(chunk_size):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _encode_strings(values):
+    text = SEPARATOR.join(values)
+    if text.count(SEPARATOR) != max(len(values) - 1, 0):
+        raise ValueError("Value contains cache separator character!")
+    return np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+
+
+def _decode_strings(data, length):
+    if not length:
+        return []
+    return bytes(data).decode("utf-8").split(SEPARATOR)
+
+
+def _write_index(entry_dir, index):
+    with open(os.path.join(entry_dir, INDEX_FILE_NAME), "w", encoding="utf-8") as file_:
+        json.dump(index, file_, ensure_ascii=False)
+
+
+def _read_index(entry_dir):
+    try:
+        with open(os.path.join(entry_dir, INDEX_FILE_NAME), encoding="utf-8") as file_:
+            return json.load(file_)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _is_valid(index, pb_file, encoding):
+    if index.get("version") != CACHE_VERSION or index.get("encoding") != encoding:
+        return False
+    stat = os.stat(pb_file)
+    if index["size"] != stat.st_size:
+        return False
+    if index["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    if index["sha256"] == file_hash(pb_file):
+        # the same content, just touched
+        index["mtime_ns"] = stat.st_mtime_ns
+        return True
+    return False
+
+
+def _load_array(entry_dir, name):
+    return np.load(
+        os.path.join(entry_dir, f"{name}.npy"), mmap_mode="r", allow_pickle=False
+    )
+
+
+def load(pb_file, encoding="utf-8-sig"):
+    """Return cache entry (index with memory-mapped arrays) or None."""
+    entry_dir = get_entry_dir(pb_file)
+    index = _read_index(entry_dir)
+    if not index or not _is_valid(index, pb_file, encoding):
+        return None
+    # mark entry as recently used
+    _write_index(entry_dir, index)
+    arrays = {name: _load_array(entry_dir, name) for name in index["arrays"]}
+    return {"index": index, "arrays": arrays}
+
+
+def save(pb_file, meta, projects, votes, encoding="utf-8-sig"):
+    """Save parsed .pb file (dicts from `utilities.load_pb_file`) to cache."""
+    entry_dir = get_entry_dir(pb_file)
+    stat = os.stat(pb_file)
+    first_vote = next(iter(votes.values()), {})
+    columns = list(first_vote)
+    arrays = {"voter_id": _encode_strings(list(votes))}
+    string_columns = [column for column in columns if column != "vote"]
+    ballots = None
+    if "vote" in columns:
+        ballots = tally.encode_ballots(
+            {voter_id: {"vote": vote["vote"]} for voter_id, vote in votes.items()},
+            projects,
+        )
+        arrays["offsets"] = ballots.offsets
+        arrays["vote_indices"] = ballots.vote_indices
+    for idx, column in enumerate(string_columns):
+        values = [vote[column] for vote in votes.values()]
+        arrays[f"column_{idx}"] = _encode_strings(values)
+
+    tmp_dir = f"{entry_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, array_ in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array_, allow_pickle=False)
+    index = {
+        "version": CACHE_VERSION,
+        "encoding": encoding,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_hash(pb_file),
+        "meta": meta,
+        "projects": projects,
+        "num_votes": len(votes),
+        "columns": columns,
+        "string_columns": string_columns,
+        "project_ids": ballots.project_ids if ballots else [],
+        "arrays": list(arrays),
+    }
+    _write_index(tmp_dir, index)
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    os.replace(tmp_dir, entry_dir)
+    evict(os.path.dirname(entry_dir), keep=entry_dir)
+
+
+def get_string_columns(entry):
+    index, arrays = entry["index"], entry["arrays"]
+    return {
+        column: _decode_strings(arrays[f"column_{idx}"], index["num_votes"])
+        for idx, column in enumerate(index["string_columns"])
+    }
+
+
+def get_voter_ids(entry):
+    return _decode_strings(entry["arrays"]["voter_id"], entry["index"]["num_votes"])
+
+
+def get_ballots(entry):
+    """Return `tally.EncodedBallots` (memory-mapped) or None if no votes."""
+    index, arrays = entry["index"], entry["arrays"]
+    if "offsets" not in arrays:
+        return None
+    return tally.EncodedBallots(
+        project_ids=list(index["project_ids"]),
+        offsets=arrays["offsets"],
+        vote_indices=arrays["vote_indices"],
+    )
+
+
+def _ballots_to_strings(ballots):
+    project_ids = ballots.project_ids
+    votes = [project_ids[idx] for idx in ballots.vote_indices.tolist()]
+    offsets = ballots.offsets.tolist()
+    return [",".join(votes[start:end]) for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def to_parsed(entry, skip_votes=False):
+    """Convert cache entry into the same output as `utilities.load_pb_file`."""
+    index = entry["index"]
+    meta, projects = index["meta"], index["projects"]
+    first_project = next(iter(projects.values()), {})
+    votes = {}
+    if not skip_votes and index["num_votes"]:
+        columns = get_string_columns(entry)
+        ballots = get_ballots(entry)
+        if ballots is not None:
+            columns["vote"] = _ballots_to_strings(ballots)
+        keys = index["columns"]
+        values = zip(*(columns[key] for key in keys))
+        votes = dict(
+            zip(get_voter_ids(entry), (dict(zip(keys, row)) for row in values))
+        )
+    return meta, projects, votes, "votes" in first_project, "score" in first_project
+
+
+def evict(cache_dir, max_size=None, keep=None):
+    """Remove least recently used entries until cache fits into `max_size`."""
+    if max_size is None:
+        max_size = settings.pb_cache_max_size
+    entries = []
+    total_size = 0
+    for name in os.listdir(cache_dir):
+        entry_dir = os.path.join(cache_dir, name)
+        if not os.path.isdir(entry_dir):
+            continue
+        size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+        index_path = os.path.join(entry_dir, INDEX_FILE_NAME)
+        last_used = os.path.getmtime(index_path) if os.path.exists(index_path) else 0
+        entries.append((last_used, size, entry_dir))
+        total_size += size
+    for _, size, entry_dir in sorted(entries):
+        if total_size <= max_size:
+            break
+        if entry_dir == keep:
+            continue
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total_size -= size
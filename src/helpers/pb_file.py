@@ -0,0 +1,281 @@
+"""Compact, array-backed representation of a parsed .pb file.
+
+PROJECTS are kept as parallel typed columns and VOTES in CSR form: one
+int32 array with indices of voted projects (`vote_indices`) and an
+`offsets` array, so ballot `i` is `vote_indices[offsets[i]:offsets[i + 1]]`.
+Points, age and sex are optional columns aligned with ballots / votes.
+Counting is done by `helpers.tally`.
+
+Example of usage:
+
+    pb = PBFile.load(path_to_pb_file)
+    counted_votes = pb.count_votes_per_project()
+    mismatched = pb.mismatched_votes()
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+import helpers.utilities as utils
+from helpers import pb_cache, tally
+
+PROJECT_COLUMNS_DTYPES = {
+    "cost": np.float64,
+    "votes": np.int64,
+    "score": np.int64,
+    "selected": np.int8,
+}
+MISSING_AGE = -1
+
+
+def _typed_column(values, dtype):
+    """Convert column into numpy array, keep it as a list if not possible."""
+    try:
+        return np.array(values, dtype=dtype)
+    except ValueError:
+        return values
+
+
+def _age_column(values):
+    try:
+        return np.array(
+            [int(value) if value else MISSING_AGE for value in values], dtype=np.int16
+        )
+    except ValueError:
+        return values
+
+
+def _project_columns(projects):
+    project_columns = {}
+    first_project = next(iter(projects.values()), {})
+    for key in first_project:
+        if key == "project_id":
+            continue
+        values = [project.get(key, "") for project in projects.values()]
+        dtype = PROJECT_COLUMNS_DTYPES.get(key)
+        project_columns[key] = _typed_column(values, dtype) if dtype else values
+    return project_columns
+
+
+def _collect_votes_columns(votes, voter_ids, columns):
+    """Pass `(voter_id, vote)` pairs through, collecting voter IDs and
+    columns other than encoded in ballots."""
+    for voter_id, vote in votes:
+        voter_ids.append(voter_id)
+        for key, value in vote.items():
+            if key not in ("vote", "points", "vote_strength"):
+                columns.setdefault(key, []).append(value)
+        yield voter_id, vote
+
+
+@dataclass
+class PBFile:
+    meta: dict
+    project_ids: list
+    project_columns: dict
+    voter_ids: np.ndarray
+    # ballots in CSR form, indexed by `all_project_ids`
+    ballots: tally.EncodedBallots
+    age: np.ndarray = None
+    sex: np.ndarray = None
+    votes_columns: dict = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, pb_file, encoding="utf-8-sig", cache=False):
+        """Load .pb file, VOTES are streamed and never kept as dicts.
+
+        With `cache`, ballots are memory-mapped from binary sidecar
+        (see `helpers.pb_cache`), it is created if missing or outdated."""
+        if cache:
+            entry = pb_cache.load(pb_file, encoding)
+            if entry is not None:
+                return cls.from_cache(entry)
+            meta, projects, votes, _, _ = utils.load_pb_file(
+                pb_file, encoding=encoding, cache=True
+            )
+            return cls.from_parsed(meta, projects, votes)
+        meta, projects, _, _, _ = utils.load_pb_file(
+            pb_file, encoding=encoding, skip_votes=True
+        )
+        return cls.from_rows(meta, projects, utils.iterate_pb_votes(pb_file, encoding))
+
+    @classmethod
+    def from_cache(cls, entry):
+        """Create it from `pb_cache.load` entry."""
+        index = entry["index"]
+        projects = index["projects"]
+        columns = pb_cache.get_string_columns(entry)
+        voter_ids = pb_cache.get_voter_ids(entry)
+        ballots = pb_cache.get_ballots(entry) or tally.encode_ballots({}, projects)
+        points = columns.pop("points", None)
+        if points is not None:
+            ballots.points = tally.encode_points(
+                voter_ids, points, ballots.ballot_lengths()
+            )
+        vote_strength = columns.pop("vote_strength", None)
+        if vote_strength is not None:
+            ballots.vote_strength = tally.parse_vote_strength(vote_strength)
+        age = columns.pop("age", None)
+        sex = columns.pop("sex", None)
+        return cls(
+            meta=index["meta"],
+            project_ids=list(projects),
+            project_columns=_project_columns(projects),
+            voter_ids=np.array(voter_ids, dtype=str),
+            ballots=ballots,
+            age=_age_column(age) if age is not None else None,
+            sex=np.array(sex, dtype=str) if sex is not None else None,
+            votes_columns=columns,
+        )
+
+    @classmethod
+    def from_parsed(cls, meta, projects, votes):
+        """Create it from dicts returned by `utilities.load_pb_file`."""
+        return cls.from_rows(meta, projects, votes.items())
+
+    @classmethod
+    def from_rows(cls, meta, projects, votes):
+        """Create it from META and PROJECTS dicts and `(voter_id, vote)` pairs."""
+        project_ids = list(projects)
+        voter_ids = []
+        columns = {}
+        ballots = tally.encode_ballots(
+            _collect_votes_columns(votes, voter_ids, columns), project_ids
+        )
+        age = columns.pop("age", None)
+        sex = columns.pop("sex", None)
+        return cls(
+            meta=meta,
+            project_ids=project_ids,
+            project_columns=_project_columns(projects),
+            voter_ids=np.array(voter_ids, dtype=str),
+            ballots=ballots,
+            age=_age_column(age) if age is not None else None,
+            sex=np.array(sex, dtype=str) if sex is not None else None,
+            votes_columns=columns,
+        )
+
+    @property
+    def num_projects(self):
+        return len(self.project_ids)
+
+    @property
+    def num_votes(self):
+        return len(self.voter_ids)
+
+    @property
+    def all_project_ids(self):
+        return self.ballots.project_ids
+
+    @property
+    def unknown_project_ids(self):
+        """Project IDs used in VOTES but not listed in PROJECTS section."""
+        return self.ballots.project_ids[self.num_projects :]
+
+    @property
+    def offsets(self):
+        return self.ballots.offsets
+
+    @property
+    def vote_indices(self):
+        return self.ballots.vote_indices
+
+    @property
+    def points(self):
+        return self.ballots.points
+
+    def ballot_lengths(self):
+        return self.ballots.ballot_lengths()
+
+    def ballot(self, voter_idx):
+        start, end = self.offsets[voter_idx], self.offsets[voter_idx + 1]
+        all_project_ids = self.all_project_ids
+        return [all_project_ids[idx] for idx in self.vote_indices[start:end]]
+
+    def votes_per_project(self):
+        """Array with number of votes per project (indexed as `all_project_ids`)."""
+        return tally.approval_counts(self.ballots)
+
+    def points_per_project(self):
+        """Array with points per project, if there are no points in VOTES,
+        points are based on vote length (first project gets vote length
+        points, the last one gets 1)."""
+        return tally.points_per_project(self.ballots)
+
+    def count_votes_per_project(self):
+        """The same as `utilities.count_votes_per_project`."""
+        return tally.to_counter(self.ballots, self.votes_per_project())
+
+    def count_points_per_project(self):
+        """The same as `utilities.count_points_per_project`."""
+        return tally.to_counter(self.ballots, self.points_per_project())
+
+    # CONSISTENCY CHECKS
+
+    def _mismatched_column(self, column, counted):
+        declared = self.project_columns.get(column)
+        if declared is None:
+            return {}
+        declared = np.array(
+            (
+                [int(float(value or 0)) for value in declared]
+                if isinstance(declared, list)
+                else declared
+            ),
+            dtype=np.int64,
+        )
+        counted = counted[: self.num_projects]
+        return {
+            self.project_ids[idx]: (int(declared[idx]), int(counted[idx]))
+            for idx in np.flatnonzero(declared != counted)
+        }
+
+    def mismatched_votes(self):
+        """Projects where `votes` in PROJECTS differs from counted in VOTES,
+        as `{project_id: (declared, counted)}`."""
+        return self._mismatched_column("votes", self.votes_per_project())
+
+    def mismatched_scores(self):
+        """Projects where `score` in PROJECTS differs from counted in VOTES,
+        as `{project_id: (declared, counted)}`."""
+        return self._mismatched_column("score", self.points_per_project())
+
+    def projects_with_no_votes(self):
+        counted = self.votes_per_project()[: self.num_projects]
+        return [self.project_ids[idx] for idx in np.flatnonzero(counted == 0)]
+
+    def duplicated_voter_ids(self):
+        voter_ids, counts = np.unique(self.voter_ids, return_counts=True)
+        return voter_ids[counts > 1].tolist()
+
+    def voters_with_duplicated_votes(self):
+        """Voters who voted for the same project more than once."""
+        lengths = self.ballot_lengths()
+        voter_idx = np.repeat(np.arange(self.num_votes), lengths)
+        pairs = voter_idx.astype(np.int64) * len(self.all_project_ids) + (
+            self.vote_indices
+        )
+        unique_pairs = np.unique(pairs)
+        if len(unique_pairs) == len(pairs):
+            return []
+        unique_per_voter = np.bincount(
+            unique_pairs // len(self.all_project_ids), minlength=self.num_votes
+        )
+        return self.voter_ids[unique_per_voter != lengths].tolist()
+
+    def ballots_longer_than(self, max_length):
+        return self.voter_ids[self.ballot_lengths() > int(max_length)].tolist()
+
+    def meta_counts_mismatch(self):
+        """Compare `num_projects` and `num_votes` in META with counted ones,
+        as `{field: (declared, counted)}`."""
+        mismatch = {}
+        for key, counted in (
+            ("num_projects", self.num_projects),
+            ("num_votes", self.num_votes),
+        ):
+            declared = self.meta.get(key)
+            if declared is not None and int(declared) != counted:
+                mismatch[key] = (int(declared), counted)
+        return mismatch
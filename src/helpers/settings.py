@@ -5,6 +5,29 @@ path_to_excel_files = os.path.join(pabulib_dir, "data")
 output_path = os.path.join(pabulib_dir, "output")
 
 logging_level = "DEBUG"
+# if set, logs are written to this file instead of stderr (e.g. in batch jobs)
+log_file = None
+
+# max total size (in bytes) of .pb_cache directory with parsed .pb files
+pb_cache_max_size = 2 * 1024**3
+
+# limits of HTTP fetcher used by scrapers (see helpers/http_fetcher.py)
+http_fetcher = {
+    "max_workers": 8,  # concurrent requests in a batch
+    "max_per_host": 4,  # concurrent requests to one host
+    "pool_connections": 4,  # hosts whose connections are kept open for reuse
+    "min_interval": 0.1,  # seconds between requests to one host
+    "retries": 3,
+    "backoff": 0.5,  # seconds, doubled after every retry
+    "timeout": 30,
+}
+
+# on-disk cache of scraped pages (see helpers/http_cache.py)
+http_cache = {
+    "ttl": 7 * 24 * 3600,  # seconds, older pages are revalidated
+    "max_size": 512 * 1024**2,  # bytes, least recently used pages are removed
+    "offline": False,  # serve pages only from cache, never hit the network
+}
 
 
 def get_path_to_excel_files(city_dir_name, extra_dir=""):
@@ -0,0 +1,168 @@
+"""Streaming readers of spreadsheets with projects and votes.
+
+All readers have the same API, rows are returned as lists of values like
+xlrd `sheet.row_values` does: numbers (and dates) as floats, booleans as
+0 / 1 and empty cells as "". Rows are read lazily, so a huge sheet is never
+kept in memory as a whole (unless caller does it, e.g. to sort rows).
+
+    .xlsx / .xlsm -> openpyxl in read-only mode
+    .csv          -> csv module, no conversion into Excel file
+    other (.xls)  -> xlrd
+
+Example of usage:
+
+    with spreadsheets.open_sheet(path_to_file) as sheet:
+        col_names_indexes = sheet.col_names_indexes()
+        for row in sheet.iter_rows(first_row=1):
+            voter_id = row[col_names_indexes["voter_id"]]
+"""
+
+import csv
+import datetime
+import os
+import re
+from abc import ABC, abstractmethod
+
+import openpyxl
+from openpyxl.utils.datetime import to_excel
+
+import helpers.utilities as utils
+
+XLSX_EXTENSIONS = (".xlsx", ".xlsm")
+NUMBER_PATTERN = re.compile(r"-?\d+(\.\d+)?")
+
+
+def _col_names_indexes(headers):
+    return {
+        str(column_name).replace("\n", " ").strip(): col_index
+        for col_index, column_name in enumerate(headers)
+    }
+
+
+def _xlrd_like_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return float(to_excel(value))
+    return value
+
+
+def _convert_number(value):
+    if NUMBER_PATTERN.fullmatch(value):
+        return float(value)
+    return value
+
+
+class SheetReader(ABC):
+    @abstractmethod
+    def iter_rows(self, first_row=0):
+        """Yield rows (lists of values) starting from `first_row`."""
+
+    def headers(self, headers_row=0):
+        for row in self.iter_rows(headers_row):
+            return row
+        return []
+
+    def col_names_indexes(self, headers_row=0):
+        """The same as `utilities.get_col_names_indexes` for xlrd sheet."""
+        return _col_names_indexes(self.headers(headers_row))
+
+    def close(self):
+        """Release the file, nothing to do if it is not kept open."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class XlsxSheetReader(SheetReader):
+    def __init__(self, path, sheet_name=None, index=0):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.index = index
+        # opened once, every `iter_rows` streams rows of the sheet again
+        self.workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        if sheet_name:
+            self.sheet = self.workbook[sheet_name]
+        else:
+            self.sheet = self.workbook.worksheets[index]
+        self.ncols = self.sheet.max_column or 0
+
+    def iter_rows(self, first_row=0):
+        rows = self.sheet.iter_rows(min_row=first_row + 1, values_only=True)
+        # empty rows at the end of sheet are skipped (as xlrd does)
+        empty_rows = []
+        for row in rows:
+            row = [_xlrd_like_value(value) for value in row]
+            if len(row) < self.ncols:
+                row.extend([""] * (self.ncols - len(row)))
+            if all(value == "" for value in row):
+                empty_rows.append(row)
+                continue
+            yield from empty_rows
+            empty_rows.clear()
+            yield row
+
+    def close(self):
+        self.workbook.close()
+
+
+class CsvSheetReader(SheetReader):
+    def __init__(self, path, delimiter=",", encoding="utf-8", convert_numbers=False):
+        self.path = path
+        self.delimiter = delimiter
+        self.encoding = encoding
+        # numeric values (except headers) are converted into floats, as xlrd
+        # returns number cells, otherwise all values are strings
+        self.convert_numbers = convert_numbers
+
+    def iter_rows(self, first_row=0):
+        with open(self.path, newline="", encoding=self.encoding) as file_:
+            reader = csv.reader(file_, delimiter=self.delimiter)
+            # rows are padded to the width of headers and empty rows at the
+            # end of file are skipped, as in XlsxSheetReader
+            ncols = 0
+            empty_rows = []
+            for idx, row in enumerate(reader):
+                if idx == 0:
+                    ncols = len(row)
+                if idx < first_row:
+                    continue
+                if len(row) < ncols:
+                    row.extend([""] * (ncols - len(row)))
+                if all(value.strip() == "" for value in row):
+                    empty_rows.append(row)
+                    continue
+                if self.convert_numbers and idx > 0:
+                    row = [_convert_number(value) for value in row]
+                yield from empty_rows
+                empty_rows.clear()
+                yield row
+
+
+class XlrdSheetReader(SheetReader):
+    def __init__(self, path, sheet_name=None, index=0):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.sheet = utils.open_excel_workbook(path, index=index, name=sheet_name)
+
+    def iter_rows(self, first_row=0):
+        for idx in range(first_row, self.sheet.nrows):
+            yield self.sheet.row_values(idx)
+
+
+def open_sheet(path, sheet_name=None, index=0, csv_settings=None):
+    """Return reader matching file extension, `csv_settings` are passed to
+    CsvSheetReader (delimiter, encoding, convert_numbers)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return CsvSheetReader(path, **(csv_settings or {}))
+    if ext in XLSX_EXTENSIONS:
+        return XlsxSheetReader(path, sheet_name=sheet_name, index=index)
+    return XlrdSheetReader(path, sheet_name=sheet_name, index=index)
@@ -0,0 +1,172 @@
+"""Vectorised tallying of ballots.
+
+Ballots are encoded once into integer arrays (CSR form, the same as in
+`helpers.pb_file.PBFile`) and then approval counts, cumulative points and
+Borda-like ordinal scores are computed with `np.bincount` / `np.add.at`,
+without splitting vote strings again. Optional `vote_strength` column weights
+every ballot in approval counts (1 if not defined); points are not weighted.
+Voters without points get points based on vote length (see `default_points`).
+
+Example of usage:
+
+    ballots = tally.encode_ballots(votes, projects)
+    counted_votes = tally.to_counter(ballots, tally.approval_counts(ballots))
+"""
+
+from array import array
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class EncodedBallots:
+    project_ids: list
+    offsets: np.ndarray
+    vote_indices: np.ndarray
+    points: np.ndarray = None
+    vote_strength: np.ndarray = None
+
+    @property
+    def num_votes(self):
+        return len(self.offsets) - 1
+
+    def ballot_lengths(self):
+        return np.diff(self.offsets)
+
+    def positions(self):
+        """Position of every vote in its ballot (0 for the first project)."""
+        return np.arange(len(self.vote_indices)) - np.repeat(
+            self.offsets[:-1], self.ballot_lengths()
+        )
+
+    def strength_per_vote(self):
+        if self.vote_strength is None:
+            return None
+        return np.repeat(self.vote_strength, self.ballot_lengths())
+
+
+def parse_vote_strength(values):
+    """Parse `vote_strength` values, empty value means default strength 1.
+    Returns int64 array if all strengths are integers, float64 otherwise."""
+    strength = np.array([float(value) if value else 1.0 for value in values])
+    if np.all(strength == np.floor(strength)):
+        return strength.astype(np.int64)
+    return strength
+
+
+def default_points(ballot_length):
+    """Points of ballot without points: the first project gets vote length
+    points, the second one less, ..., the last one gets 1."""
+    return range(ballot_length, 0, -1)
+
+
+def parse_points(voter_id, value, ballot_length):
+    """Parse points of one ballot, there must be one point per vote."""
+    ballot_points = value.split(",") if value else []
+    if len(ballot_points) != ballot_length:
+        raise ValueError(
+            f"Voter `{voter_id}` has {ballot_length} votes "
+            f"but {len(ballot_points)} points"
+        )
+    return [int(point) for point in ballot_points]
+
+
+def encode_points(voter_ids, values, ballot_lengths):
+    """Encode `points` column (one value per voter) into array aligned with
+    `vote_indices` of ballots with given lengths."""
+    points = array("i")
+    for voter_id, value, length in zip(voter_ids, values, ballot_lengths.tolist()):
+        points.extend(parse_points(voter_id, value, length))
+    return np.frombuffer(points, dtype=np.int32)
+
+
+def encode_ballots(votes, project_ids=()):
+    """Encode votes into integer arrays.
+
+    `votes` is `{voter_id: vote_dict}` (as returned by `load_pb_file`) or
+    an iterable of `(voter_id, vote_dict)` pairs. Projects are indexed
+    in `project_ids` order, projects that appear only in votes are appended.
+    Points and strengths are kept for every voter (with defaults for voters
+    without them) if at least one voter has them.
+    """
+    if isinstance(votes, dict):
+        votes = votes.items()
+    project_ids = list(project_ids)
+    project_index = {project_id: idx for idx, project_id in enumerate(project_ids)}
+    offsets = array("q", [0])
+    vote_indices = array("i")
+    points = array("i")
+    strengths = []
+    has_points = has_strength = False
+    for voter_id, vote in votes:
+        ballot = vote.get("vote", "")
+        ballot = ballot.split(",") if ballot else []
+        for project_id in ballot:
+            idx = project_index.get(project_id)
+            if idx is None:
+                idx = project_index[project_id] = len(project_ids)
+                project_ids.append(project_id)
+            vote_indices.append(idx)
+        offsets.append(len(vote_indices))
+        if "points" in vote:
+            points.extend(parse_points(voter_id, vote["points"], len(ballot)))
+            has_points = True
+        else:
+            points.extend(default_points(len(ballot)))
+        if "vote_strength" in vote:
+            has_strength = True
+        strengths.append(vote.get("vote_strength"))
+
+    return EncodedBallots(
+        project_ids=project_ids,
+        offsets=np.frombuffer(offsets, dtype=np.int64),
+        vote_indices=np.frombuffer(vote_indices, dtype=np.int32),
+        points=np.frombuffer(points, dtype=np.int32) if has_points else None,
+        vote_strength=parse_vote_strength(strengths) if has_strength else None,
+    )
+
+
+def _weighted_count(ballots, weights, use_strength=False):
+    strength = ballots.strength_per_vote() if use_strength else None
+    if strength is not None:
+        weights = strength if weights is None else weights * strength
+    if weights is None:
+        return np.bincount(ballots.vote_indices, minlength=len(ballots.project_ids))
+    counted = np.zeros(len(ballots.project_ids), dtype=np.result_type(weights))
+    np.add.at(counted, ballots.vote_indices, weights)
+    return counted
+
+
+def approval_counts(ballots):
+    """Number of votes per project, weighted by `vote_strength`."""
+    return _weighted_count(ballots, None, use_strength=True)
+
+
+def cumulative_points(ballots):
+    """Sum of points per project, ballots must have points."""
+    if ballots.points is None:
+        raise ValueError("There are no points in ballots!")
+    return _weighted_count(ballots, ballots.points.astype(np.int64))
+
+
+def ordinal_scores(ballots):
+    """Borda-like score per project: in a ballot of length n, the first
+    project gets n points, the second n - 1, ..., the last one gets 1."""
+    lengths = ballots.ballot_lengths()
+    weights = np.repeat(lengths, lengths) - ballots.positions()
+    return _weighted_count(ballots, weights)
+
+
+def points_per_project(ballots):
+    """Cumulative points if ballots have points, ordinal scores otherwise."""
+    if ballots.points is not None:
+        return cumulative_points(ballots)
+    return ordinal_scores(ballots)
+
+
+def to_counter(ballots, counted):
+    """Convert array from tally functions into `{project_id: value}` dict,
+    projects with no votes are skipped."""
+    project_ids = ballots.project_ids
+    return {project_ids[idx]: counted[idx].item() for idx in np.flatnonzero(counted)}
@@ -1,3 +1,12 @@
+"""Shared helpers of data processing (files, spreadsheets, names, HTML).
+
+HTML pages are parsed with the standard `html.parser` (`HTML_PARSER`), lxml
+is not a dependency. Parsers build different trees from broken HTML, and
+scrapers of cities are written against the trees of html.parser, so one
+parser is used everywhere. Parsing is made cheaper by parsing only needed
+parts of pages (`html_target`) instead of a faster parser.
+"""
+
 import csv
 import glob
 import io
@@ -7,18 +16,23 @@ import os
 import re
 import sys
 from collections import defaultdict
+from functools import lru_cache
 
 import numpy as np
-import requests
 import unidecode
 import xlrd
 from bs4 import BeautifulSoup as bs
+from bs4 import SoupStrainer
 from loguru import logger
+from natsort import natsort_keygen
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from xlsxwriter.workbook import Workbook
 
-from helpers import settings
+from helpers import http_fetcher, pb_cache, settings, tally
+
+# the same parser everywhere, see module docstring
+HTML_PARSER = "html.parser"
 
 wrong_votes = (r"\N", "NULL", "---", "0", 0)
 
@@ -78,21 +92,46 @@ def prepend_line_at_the_beggining_of_file(text, path_to_file):
     os.rename(dummy_file, path_to_file)
 
 
-def get_soup(url):
-    """Get soup from given url."""
-    page = requests.get(
-        url,
-        # verify=False
-    )
-    soup = bs(page.content, "html.parser")
+def html_target(tag, css_class=None, **attrs):
+    """Part of page parsed by `make_soup` / `get_soup`: `tag` (name or list of
+    names) with given attrs, e.g. `html_target("tbody", id="projects-list")`.
+    `css_class` (or a tuple of alternatives) matches one of classes of tag."""
+    if css_class:
+        if isinstance(css_class, str):
+            css_class = (css_class,)
+        classes = "|".join(re.escape(name) for name in css_class)
+        attrs["class"] = re.compile(rf"(^|\s)({classes})(\s|$)")
+    return SoupStrainer(tag, attrs=attrs)
+
+
+def make_soup(content, target=None):
+    """Parse fetched page (e.g. from `http_fetcher.fetch_all`). With `target`
+    (`html_target` or a list of them) only matching tags, with their
+    subtrees, are parsed, so `soup.find` works as on the full page."""
+    if not isinstance(target, (list, tuple)):
+        return bs(content, HTML_PARSER, parse_only=target)
+    soup = bs(content, HTML_PARSER, parse_only=target[0])
+    for part in target[1:]:
+        soup.extend(bs(content, HTML_PARSER, parse_only=part).contents)
     return soup
 
 
+def get_soup(url, cache=None, target=None):
+    """Get soup from given url (shared session, timeout and retries). Page is
+    taken from / saved to `cache` (`http_cache.HTTPCache`) if given."""
+    page = http_fetcher.get_fetcher().get(url, cache=cache)
+    return make_soup(page.content, target)
+
+
 def get_soup_requests_with(url):
     """Get soup from given url."""
-    with requests.get(url, stream=True) as page:
-        soup = bs(page.content, "html.parser")
-        return soup
+    return get_soup(url)
+
+
+def get_soups(urls, cache=None, target=None):
+    """Fetch urls concurrently, yield `(url, soup)` pairs as they complete."""
+    for url, page in http_fetcher.get_fetcher().fetch_all(urls, cache=cache):
+        yield url, make_soup(page.content, target)
 
 
 def remove_semicolon(text):
@@ -209,9 +248,18 @@ def create_json_filepath(country, unit, year, file_name):
     return os.path.join(settings.output_path, "jsons", filename).replace("\\", "/")
 
 
+def to_json_serializable(obj):
+    """Materialise lightweight records (e.g. VoterItem) while dumping JSON."""
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
 def save_dict_as_json(data_dict, filepath):
     # Serializing json
-    json_object = json.dumps(data_dict, indent=4, ensure_ascii=False)
+    json_object = json.dumps(
+        data_dict, indent=4, ensure_ascii=False, default=to_json_serializable
+    )
     # Writing to sample.json
     with open(filepath, "w", encoding="utf-8") as outfile:
         outfile.write(json_object)
@@ -277,6 +325,10 @@ def remove_charmaps(string):
     return string
 
 
+# district / project names are normalised for every voter (get_votes_excel,
+# VoterItem.add_district) but there are few distinct names, so results of
+# these pure functions are memoised
+@lru_cache(maxsize=16384)
 def clean_project_name(name):
     name = name.lower()
     name = clean_name(name)
@@ -293,6 +345,7 @@ def create_project_id_from_district(district, project_no):
     return project_id
 
 
+@lru_cache(maxsize=4096)
 def change_district_into_name(district):
     district = district.strip()
     district = remove_accents_from_str(district)
@@ -304,6 +357,7 @@ def change_district_into_name(district):
     return district
 
 
+@lru_cache(maxsize=4096)
 def create_district_subdistrict_upper(district_upper, subdistrict):
     subdistrict = change_district_into_name(subdistrict)
     district_upper = f"{district_upper}_{subdistrict}"
@@ -373,9 +427,10 @@ def create_logger(logger_level=None):
         ":<cyan>{function}</cyan>:"
         "<cyan>{line}</cyan> "
     )
+    sink = settings.log_file or sys.stderr
     config = {
         "handlers": [
-            {"sink": sys.stderr, "format": fmt, "level": logger_level},
+            {"sink": sink, "format": fmt, "level": logger_level},
         ],
     }
     logger.remove()  # All configured handlers are removed
@@ -415,46 +470,120 @@ def load_pb_file_from_gcs(file_content):
     return parse_pb_content(csvfile)
 
 
-def parse_pb_content(csvfile):
-    meta, projects, votes = {}, {}, {}
+PB_SECTIONS = ("meta", "projects", "votes")
+
+
+def iterate_pb_content(csvfile):
+    """Lazily iterate over .pb content, section by section.
+
+    Yields `("meta", None, meta)` once, then `("projects", project_id, project)`
+    for every PROJECTS row and `("votes", voter_id, vote)` for every VOTES row.
+    Section headers are validated, stripped and interned only once, so memory
+    stays flat no matter how many voters are in the file.
+    """
+    meta = {}
+    meta_yielded = False
     section = ""
-    header = []
+    keys = ()
     reader = csv.reader(csvfile, delimiter=";")
     for row in reader:
-        if row:
-            if str(row[0]).strip().lower() in ["meta", "projects", "votes"]:
-                section = str(row[0]).strip().lower()
-                header = next(reader)
-                check_header = header[0].strip().lower()
-                # Validate header for each section
-                if section == "projects" and check_header != "project_id":
-                    raise ValueError(
-                        "First value in PROJECTS section is not 'project_id': {check_header}"
-                    )
-                if section == "votes" and check_header != "voter_id":
-                    raise ValueError(
-                        f"First value in VOTES section is not 'voter_id': {check_header}"
-                    )
-            elif section == "meta":
-                meta[row[0]] = row[1].strip()
-            elif section == "projects":
-                votes_in_projects = True if "votes" in header else False
-                scores_in_projects = True if "score" in header else False
-                projects[row[0]] = {"project_id": row[0]}
-                for it, key in enumerate(header[1:]):
-                    projects[row[0]][key.strip()] = row[it + 1].strip()
-            elif section == "votes":
-                if votes.get(row[0]):
-                    raise RuntimeError(f"Duplicated Voter ID!! {row[0]}")
-                votes[row[0]] = {}
-                for it, key in enumerate(header[1:]):
-                    votes[row[0]][key.strip()] = row[it + 1].strip()
+        if not row:
+            continue
+        row_id = row[0]
+        section_name = row_id.strip().lower()
+        if section_name in PB_SECTIONS:
+            section = section_name
+            header = next(reader)
+            check_header = header[0].strip().lower()
+            # Validate header for each section
+            if section == "projects" and check_header != "project_id":
+                raise ValueError(
+                    f"First value in PROJECTS section is not 'project_id': {check_header}"
+                )
+            if section == "votes" and check_header != "voter_id":
+                raise ValueError(
+                    f"First value in VOTES section is not 'voter_id': {check_header}"
+                )
+            keys = tuple(sys.intern(key.strip()) for key in header[1:])
+            if section != "meta" and not meta_yielded:
+                meta_yielded = True
+                yield "meta", None, meta
+        elif section == "meta":
+            meta[row_id] = row[1].strip()
+        elif section in ("projects", "votes"):
+            values = row[1:]
+            if len(values) < len(keys):
+                raise ValueError(
+                    f"Row `{row_id}` in {section.upper()} section has "
+                    f"{len(values)} values, expected {len(keys)}"
+                )
+            row_dict = {"project_id": row_id} if section == "projects" else {}
+            for key, value in zip(keys, values):
+                row_dict[key] = value.strip()
+            yield section, row_id, row_dict
+    if not meta_yielded:
+        yield "meta", None, meta
+
+
+def iterate_pb_file(pb_file, encoding="utf-8-sig"):
+    """Lazily iterate over .pb file, see `iterate_pb_content`."""
+    with open(pb_file, "r", newline="", encoding=encoding) as csvfile:
+        yield from iterate_pb_content(csvfile)
+
+
+def iterate_pb_votes(pb_file, encoding="utf-8-sig"):
+    """Yield `(voter_id, vote)` pairs from VOTES section of .pb file."""
+    for section, voter_id, vote in iterate_pb_file(pb_file, encoding):
+        if section == "votes":
+            yield voter_id, vote
+
+
+def count_pb_votes(pb_file, encoding="utf-8-sig"):
+    """Count voters in .pb file without keeping VOTES in memory."""
+    return sum(1 for _ in iterate_pb_votes(pb_file, encoding))
+
+
+def parse_pb_content(csvfile, skip_votes=False):
+    meta, projects, votes = {}, {}, {}
+    for section, row_id, row in iterate_pb_content(csvfile):
+        if section == "meta":
+            meta = row
+        elif section == "projects":
+            projects[row_id] = row
+        elif section == "votes":
+            if skip_votes:
+                break
+            if row_id in votes:
+                raise RuntimeError(f"Duplicated Voter ID!! {row_id}")
+            votes[row_id] = row
+    first_project = next(iter(projects.values()), {})
+    votes_in_projects = "votes" in first_project
+    scores_in_projects = "score" in first_project
     return meta, projects, votes, votes_in_projects, scores_in_projects
 
 
-def load_pb_file(pb_file, encoding="utf-8-sig"):
+def load_pb_file(pb_file, encoding="utf-8-sig", skip_votes=False, cache=False):
+    """Load .pb file into dicts. With `skip_votes` VOTES section is not read,
+    use `iterate_pb_votes` to stream it when needed.
+
+    If `cache` is set, parsed file is stored in binary sidecar next to it
+    and reused as long as file is not changed (see `helpers.pb_cache`)."""
+    if cache:
+        entry = pb_cache.load(pb_file, encoding)
+        if entry is not None:
+            return pb_cache.to_parsed(entry, skip_votes=skip_votes)
+        if skip_votes:
+            # not worth to parse whole file just to cache it
+            cache = False
     with open(pb_file, "r", newline="", encoding=encoding) as csvfile:
-        return parse_pb_content(csvfile)
+        parsed = parse_pb_content(csvfile, skip_votes=skip_votes)
+    if cache:
+        meta, projects, votes, _, _ = parsed
+        try:
+            pb_cache.save(pb_file, meta, projects, votes, encoding)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cannot cache {os.path.basename(pb_file)}: {e}")
+    return parsed
 
 
 def atoi(text):
@@ -474,37 +603,66 @@ def human_sorting(list_to_sort):
     list_to_sort.sort(key=natural_keys)
 
 
+# natsort key of a value, cached as the same voter IDs are sorted in every
+# district they voted in
+natural_sort_key = lru_cache(maxsize=65536)(natsort_keygen())
+
+
+def integer_ids_array(values):
+    """Return values as int64 array if all of them are integers (also digit
+    strings and integral floats), None otherwise."""
+    numbers = []
+    for value in values:
+        if isinstance(value, str):
+            if not (value.isascii() and value.isdigit()) or len(value) > 18:
+                return None
+            numbers.append(int(value))
+        elif isinstance(value, int):
+            numbers.append(value)
+        elif isinstance(value, float) and value.is_integer() and abs(value) < 2**53:
+            numbers.append(int(value))
+        else:
+            return None
+    try:
+        return np.array(numbers, dtype=np.int64)
+    except OverflowError:
+        return None
+
+
+def natural_sorted(items, key=None):
+    """Sort items in the same order as `natsorted(items, key=key)`.
+
+    Integer IDs (most of voter IDs) are sorted with numpy stable argsort,
+    other values by cached natsort key. Already sorted input is returned
+    as it is (the same list object if a list was given)."""
+    if not isinstance(items, list):
+        items = list(items)
+    values = [key(item) for item in items] if key else items
+    numbers = integer_ids_array(values)
+    if numbers is not None:
+        if (numbers[1:] >= numbers[:-1]).all():
+            return items
+        return [items[idx] for idx in np.argsort(numbers, kind="stable")]
+    keys = [natural_sort_key(value) for value in values]
+    if all(key_1 <= key_2 for key_1, key_2 in zip(keys, keys[1:])):
+        return items
+    order = sorted(range(len(items)), key=keys.__getitem__)
+    return [items[idx] for idx in order]
+
+
 def count_votes_per_project(votes):
+    # Vote strength, if not defined 1 is default
+    ballots = tally.encode_ballots(votes)
     counted_votes = defaultdict(int)
-    for _, vote in votes.items():
-        # Vote strength, if not defined 1 is default
-        vote_strength = vote.get("vote_strength", 1)
-        projects = vote["vote"].split(",")
-        for project in projects:
-            counted_votes[project] += vote_strength
+    counted_votes.update(tally.to_counter(ballots, tally.approval_counts(ballots)))
     return counted_votes
 
 
-def create_points_based_on_vote_length(projects):
-    points = []
-    point = len(projects)
-    for _ in projects:
-        points.append(point)
-        point -= 1
-    return points
-
-
 def count_points_per_project(votes):
+    # if there are no points, they are based on vote length
+    ballots = tally.encode_ballots(votes)
     counted_scores = defaultdict(int)
-    for _, vote in votes.items():
-        # Vote strength, if not defined 1 is default
-        projects = vote["vote"].split(",")
-        try:
-            points = vote["points"].split(",")
-        except KeyError:
-            points = create_points_based_on_vote_length(projects)
-        for project, point in zip(projects, points):
-            counted_scores[project] += int(point)
+    counted_scores.update(tally.to_counter(ballots, tally.points_per_project(ballots)))
     return counted_scores
 
 
@@ -7,6 +7,21 @@ or to calculate selected projects from budget value.
 It loads pb file (from output directory), makes some changes and (if wanted)
 saves new files to output/cleaned dir.
 
+Files can be processed in parallel: set `processes` to the number of worker
+processes. Each file is processed independently (its state is kept in
+PBFileState) and results like `global_data` or `comments` are merged in
+the parent process.
+
+Modifications are registered steps (see `modification_step`), pick them in
+SELECTED_STEPS or from the command line:
+
+    python modify_pb_files.py --list-steps
+    python modify_pb_files.py -s update_projects_votes -s update_number_of_votes
+
+Steps declare which sections they need, VOTES are loaded only if some
+selected step needs them. Consecutive per-row steps are fused, so they
+share one pass over PROJECTS / VOTES.
+
 NOTE: if field is not mentioned in fields.py file, it
 will not be saved during modifications. So if there is an
 extra (custom) new field, it will be skipped.
@@ -17,21 +32,209 @@ import csv
 import glob
 import os
 import re
-from copy import deepcopy
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
 
+import click
 import pycountry
 from pabulib.checker import flds
 
 import helpers.utilities as utils
+from helpers import tally
 
 logger = utils.create_logger()
 
+# steps run when no steps are passed, in this order
+SELECTED_STEPS = [
+    # "remove_projects_with_no_cost",
+    # "remove_projects_with_no_votes",
+    # "update_projects_votes",
+    # "update_number_of_votes",
+    # "update_number_of_projects",
+    # "update_projects_scores",
+    # "replace_commas_in_floats",
+    # "replace_semicolons_in_votes",
+    # "add_selected_to_projects_section",
+    # "calculate_selected_from_budget",
+    # "change_voters_sex",
+    # "sort_projects_by_score",
+    # "change_year_into_dates",
+    # "add_fully_funded",
+    # "add_currency",
+    # "add_description",
+    # "change_type_into_choose_1",
+    # "get_all_used_comments",
+    # "change_description",
+    # "modify_zurich_files",
+    # "modify_mechanical_turk_files",
+    # "remove_scores_from_approvals",
+    # "standarize_category_column_in_projects",
+    # "check_dates",
+    # "change_true_flags_to_1",
+    # "modify_stanford_files",
+    # "check_language_and_currency_codes",
+    # "check_comment_iteration",
+    # "change_warsaw_and_czestochowa",
+    # "new_fields_changes",
+    # "remove_unwanted_values",
+    # "swap_latitude_and_longitude",
+    # "add_projects_coordinates",
+    # "cumulative_length_fix",
+]
+
+
+@dataclass(frozen=True)
+class ModificationStep:
+    name: str
+    func: Callable
+    # sections the step needs as dicts (META and PROJECTS are always loaded),
+    # steps which only count votes use `iterate_votes` and don't need VOTES
+    sections: tuple
+    # per-row step is called as `func(modifier, row_id, row)` for every row
+    # of its section and returns the row, or None to remove it
+    per_row: bool = False
+
+    @property
+    def needs_votes(self):
+        return "votes" in self.sections
+
+    @property
+    def row_section(self):
+        if not self.per_row:
+            return None
+        return "votes" if self.needs_votes else "projects"
+
+
+MODIFICATION_STEPS = {}
+
+
+def modification_step(*sections, per_row=False):
+    """Register ModifyPBFiles method as a modification step."""
+
+    def decorator(func):
+        if per_row and len({"projects", "votes"} & set(sections)) != 1:
+            raise ValueError(
+                f"Per-row step `{func.__name__}` must touch PROJECTS or VOTES"
+            )
+        MODIFICATION_STEPS[func.__name__] = ModificationStep(
+            name=func.__name__, func=func, sections=sections, per_row=per_row
+        )
+        return func
+
+    return decorator
+
+
+def get_steps(names):
+    unknown_names = [name for name in names if name not in MODIFICATION_STEPS]
+    if unknown_names:
+        raise ValueError(
+            f"Unknown modification step(s): {unknown_names}. "
+            f"Available steps: {list(MODIFICATION_STEPS)}"
+        )
+    return [MODIFICATION_STEPS[name] for name in names]
+
+
+def fuse_steps(steps):
+    """Group steps into passes, consecutive per-row steps share one pass."""
+    groups = []
+    for step in steps:
+        if step.per_row and groups and groups[-1][0].per_row:
+            groups[-1].append(step)
+        else:
+            groups.append([step])
+    return groups
+
+
+@dataclass
+class PBFileState:
+    """State of a single processed file, it is what a worker returns
+    to the parent process when files are processed in parallel."""
+
+    pb_file: str
+    filename: str
+    meta: dict
+    projects: dict
+    votes: dict
+    check_votes: bool
+    check_scores: bool
+    modified: bool = False
+    ballots: tally.EncodedBallots = None
+    # results collected across all files
+    global_data: list = field(default_factory=list)
+    comments: dict = field(default_factory=lambda: collections.defaultdict(list))
+    counter: list = field(default_factory=list)
+
+    @classmethod
+    def load(cls, pb_file, load_votes=True, use_cache=False):
+        meta, projects, votes, check_votes, check_scores = utils.load_pb_file(
+            pb_file, skip_votes=not load_votes, cache=use_cache
+        )
+        return cls(
+            pb_file=pb_file,
+            filename=os.path.basename(pb_file),
+            meta=meta,
+            projects=projects,
+            votes=votes,
+            # TODO
+            check_votes=check_votes,
+            check_scores=check_scores,
+        )
+
+    def drop_data(self):
+        """Keep only results, file data is not needed after saving."""
+        self.meta = self.projects = self.votes = self.ballots = None
+        return self
+
+
+def _state_field(name):
+    return property(
+        lambda self: getattr(self.state, name),
+        lambda self, value: setattr(self.state, name, value),
+    )
+
+
+_worker_modifier = None
+
+
+def _init_worker(modifier):
+    global _worker_modifier
+    _worker_modifier = modifier
+
+
+def _process_pb_file_in_worker(pb_file):
+    return _worker_modifier.process_pb_file(pb_file).drop_data()
+
 
 @dataclass
 class ModifyPBFiles:
     input_files_path: str = None
     output_files_path: str = None
+    # names of steps to run, SELECTED_STEPS if not set
+    steps: list = None
+    # by default VOTES are loaded only if some selected step needs them,
+    # otherwise votes are streamed from the input file while saving
+    load_votes: bool = None
+    # save all files, not only the ones modified by steps
+    save_all: bool = False
+    # set it to True to reuse parsed files from binary cache (.pb_cache dir)
+    use_cache: bool = False
+    # number of worker processes, files are processed in parallel if > 1
+    processes: int = 1
+
+    # per file state, see PBFileState
+    pb_file = _state_field("pb_file")
+    filename = _state_field("filename")
+    meta = _state_field("meta")
+    projects = _state_field("projects")
+    votes = _state_field("votes")
+    check_votes = _state_field("check_votes")
+    check_scores = _state_field("check_scores")
+    modified = _state_field("modified")
+    ballots = _state_field("ballots")
+    global_data = _state_field("global_data")
+    comments = _state_field("comments")
+    counter = _state_field("counter")
 
     def __post_init__(self):
         pabulib_dir = os.path.join(os.getcwd(), "src")
@@ -39,40 +242,72 @@ class ModifyPBFiles:
             self.input_files_path = os.path.join(pabulib_dir, "output", "*.pb")
         if not self.output_files_path:
             self.output_files_path = os.path.join(pabulib_dir, "output", "cleaned")
+        if self.steps is None:
+            self.steps = SELECTED_STEPS
+        selected_steps = get_steps(self.steps)
+        needs_votes = any(step.needs_votes for step in selected_steps)
+        if self.load_votes is None:
+            self.load_votes = needs_votes
+        elif needs_votes and not self.load_votes:
+            raise ValueError("Selected steps need VOTES, set `load_votes` to True")
+        self.step_groups = fuse_steps(selected_steps)
 
     def iterate_through_pb_files(self):
         files = glob.glob(self.input_files_path)
         utils.human_sorting(files)
-        self.global_data = []
-        for idx, pb_file in enumerate(files):
-            self.filename = os.path.basename(pb_file)
-            logger.info(f"Processing file: {self.filename}")
-            (
-                self.meta,
-                self.projects,
-                self.votes,
-                # TODO
-                self.check_votes,
-                self.check_scores,
-            ) = utils.load_pb_file(pb_file)
-            self.do_some_modifications(idx)
-            # IF YOU WANT TO SAVE ONLY MODIFIED FILES
-            if self.modified:
-                self.save_to_file()
-            # self.save_to_file()
-            self.modified = False
-        for data in self.global_data:
+        if self.processes > 1:
+            with ProcessPoolExecutor(
+                max_workers=self.processes,
+                initializer=_init_worker,
+                initargs=(self,),
+            ) as executor:
+                states = executor.map(_process_pb_file_in_worker, files)
+                for state in states:
+                    self.merge_state(state)
+        else:
+            for pb_file in files:
+                self.merge_state(self.process_pb_file(pb_file).drop_data())
+        for data in self.all_global_data:
             print(data)
 
+    def process_pb_file(self, pb_file):
+        self.state = PBFileState.load(
+            pb_file, load_votes=self.load_votes, use_cache=self.use_cache
+        )
+        logger.info(f"Processing file: {self.filename}")
+        self.do_some_modifications()
+        if self.modified or self.save_all:
+            self.save_to_file()
+        return self.state
+
+    def merge_state(self, state):
+        self.all_global_data.extend(state.global_data)
+        for comment, files in state.comments.items():
+            self.all_comments[comment].extend(files)
+        self.all_counter.extend(state.counter)
+
+    @modification_step("meta")
     def update_number_of_votes(self):
-        self.meta["num_votes"] = len(self.votes)
+        if self.load_votes:
+            self.meta["num_votes"] = len(self.votes)
+        else:
+            self.meta["num_votes"] = utils.count_pb_votes(self.pb_file)
 
+    @modification_step("meta", "projects")
     def update_number_of_projects(self):
         self.meta["num_projects"] = len(self.projects)
 
+    def get_ballots(self):
+        """Encode ballots once per file, they are shared by tallying steps."""
+        if self.ballots is None:
+            self.ballots = tally.encode_ballots(self.iterate_votes(), self.projects)
+        return self.ballots
+
+    @modification_step("projects")
     def update_projects_votes(self):
         remove_projects_with_no_votes = True
-        self.counted_votes = utils.count_votes_per_project(self.votes)
+        ballots = self.get_ballots()
+        self.counted_votes = tally.to_counter(ballots, tally.approval_counts(ballots))
         project_list = [project[0] for project in self.projects.items()]
         for project_id in project_list:
             counted_votes = self.counted_votes.get(project_id)
@@ -89,11 +324,15 @@ class ModifyPBFiles:
             else:
                 self.projects[project_id]["votes"] = counted_votes
 
+    @modification_step("meta", "projects")
     def update_projects_scores(self):
         if self.meta["vote_type"] in ("cumulative", "ordinal"):
             (_, project_data), *_ = self.projects.items()
             if not project_data.get("score"):
-                self.counted_scores = utils.count_points_per_project(self.votes)
+                ballots = self.get_ballots()
+                self.counted_scores = tally.to_counter(
+                    ballots, tally.points_per_project(ballots)
+                )
                 for project_id, score in self.counted_scores.items():
                     self.projects[project_id]["score"] = score
                 self.modified = True
@@ -104,6 +343,7 @@ class ModifyPBFiles:
         #     for project_id, score in self.counted_scores.items():
         #         self.projects[project_id]["score"] = score
 
+    @modification_step("meta", "projects")
     def replace_commas_in_floats(self):
         if "," in self.meta["budget"]:
             self.meta["budget"] = float(self.meta["budget"].replace(",", "."))
@@ -123,6 +363,7 @@ class ModifyPBFiles:
                     )
                     self.modified = True
 
+    @modification_step("projects")
     def sort_projects_by_score(self):
         first_project_dict = next(iter(self.projects.values()))
         if "score" in first_project_dict:
@@ -137,43 +378,33 @@ class ModifyPBFiles:
             )
         )
 
-    def do_some_modifications(self, idx):
-        self.modified = False  # set it to True if you want to save new file
-        # self.remove_projects_with_no_cost()
-        # self.remove_projects_with_no_votes()
-        # self.update_projects_votes()
-        # self.update_number_of_votes()
-        # self.update_number_of_projects()
-        # self.update_projects_scores()
-        # self.replace_commas_in_floats()
-        # self.replace_semicolons_in_votes()
-        # self.add_selected_to_projects_section(idx)
-        # self.calculate_selected_from_budget()
-        # self.change_voters_sex()
-        # self.projects = utils.sort_projects_by_results(self.projects)
-        # self.change_year_into_dates()
-        # self.add_fully_funded()
-        # self.add_currency()
-        # self.add_description()
-        # self.change_type_into_choose_1()
-        # self.get_all_used_comments()
-        # self.change_description()
-        # self.modify_zurich_files()
-        # self.modify_mechanical_turk_files()
-        # self.remove_scores_from_approvals()
-        # self.standarize_category_column_in_projects()
-        # self.check_dates()
-        # self.change_true_flags_to_1()
-        # self.modify_stanford_files()
-        # self.check_language_and_currency_codes()
-        # self.check_comment_iteration()
-        # self.change_warsaw_and_czestochowa()
-        # self.new_fields_changes()
-        # self.remove_unwanted_values()
-        # self.swap_latitude_and_longitude()
-        # self.add_projects_coordinates()
-        # self.cumulative_length_fix()
+    def do_some_modifications(self):
+        self.modified = False  # steps set it to True if file should be saved
+        for steps in self.step_groups:
+            if steps[0].per_row:
+                self.run_row_steps(steps)
+            else:
+                steps[0].func(self)
+
+    def run_row_steps(self, steps):
+        """Run per-row steps in a single pass over PROJECTS and VOTES."""
+        for section in ("projects", "votes"):
+            funcs = [step.func for step in steps if step.row_section == section]
+            if not funcs:
+                continue
+            rows = {}
+            for row_id, row in getattr(self, section).items():
+                for func in funcs:
+                    row = func(self, row_id, row)
+                    if row is None:
+                        break
+                else:
+                    rows[row_id] = row
+            setattr(self, section, rows)
+            if section == "votes":
+                self.ballots = None
 
+    @modification_step("meta")
     def cumulative_length_fix(self):
         if self.meta["vote_type"] == "cumulative":
             # Rename legacy cumulative fields to new naming
@@ -203,6 +434,7 @@ class ModifyPBFiles:
             if renamed:
                 self.modified = True
 
+    @modification_step("meta", "projects")
     def add_projects_coordinates(self):
         "Wielczka special case: we've got coords, but Wieliczka wasnt process via this code."
         filename = "project_coordinates"
@@ -221,11 +453,13 @@ class ModifyPBFiles:
             project_data["longitude"] = coords["lng"] if coords else None
         self.modified = True
 
+    @modification_step("projects")
     def swap_latitude_and_longitude(self):
         (_, project_data), *_ = self.projects.items()
         if project_data.get("latitude"):
             self.modified = True
 
+    @modification_step("meta", "projects")
     def new_fields_changes(self):
         from datetime import datetime
 
@@ -264,16 +498,18 @@ class ModifyPBFiles:
                 nested_dict["neighborhood"] = nested_dict.pop("neighbourhood")
             self.modified = True
 
-    def remove_unwanted_values(self):
-        for voter_id, voter_data in self.votes.items():
-            for field_value, field_data in voter_data.items():
-                if "None" in field_data:
-                    self.votes[voter_id][field_value] = field_data.replace("None", "")
-                    self.modified = True
-                if r"\N" in field_data:
-                    self.votes[voter_id][field_value] = field_data.replace(r"\N", "")
-                    self.modified = True
+    @modification_step("votes", per_row=True)
+    def remove_unwanted_values(self, voter_id, vote):
+        for key, value in vote.items():
+            if "None" in value:
+                value = vote[key] = value.replace("None", "")
+                self.modified = True
+            if r"\N" in value:
+                vote[key] = value.replace(r"\N", "")
+                self.modified = True
+        return vote
 
+    @modification_step("meta")
     def change_warsaw_and_czestochowa(self):
         # description = self.meta["description"]
         # if "Warsaw" in description:
@@ -295,6 +531,7 @@ class ModifyPBFiles:
             self.meta["description"] = description.replace(subunit, subunit.title())
             self.modified = True
 
+    @modification_step("meta")
     def check_comment_iteration(self):
         comment = self.meta.get("comment")
         if comment:
@@ -302,6 +539,7 @@ class ModifyPBFiles:
                 self.meta["comment"] = f"#1: {comment}"
                 self.modified = True
 
+    @modification_step("meta")
     def check_language_and_currency_codes(self):
         language_code_mapping = {
             "polish": "pl",
@@ -334,11 +572,13 @@ class ModifyPBFiles:
                 except KeyError:
                     raise RuntimeError(f"currency_code: {currency_code}")
 
+    @modification_step("meta")
     def modify_stanford_files(self):
         vote_type = self.meta["vote_type"]
         if vote_type != "approval":
             self.global_data.append(self.meta["description"])
 
+    @modification_step("meta")
     def change_true_flags_to_1(self):
         fully_funded = self.meta.get("fully_funded")
         if fully_funded:
@@ -352,6 +592,7 @@ class ModifyPBFiles:
                 self.meta["experimental"] = "1"
                 self.modified = True
 
+    @modification_step("meta")
     def check_dates(self):
         date_begin = self.meta["date_begin"]
         date_end = self.meta["date_end"]
@@ -365,11 +606,13 @@ class ModifyPBFiles:
                 return
             raise RuntimeError(f"date `{date}` do not match the pattern")
 
+    @modification_step("projects")
     def standarize_category_column_in_projects(self):
         (_, project_data), *_ = self.projects.items()
         if project_data.get("categories"):
             self.modified = True
 
+    @modification_step("meta", "projects")
     def remove_scores_from_approvals(self):
         if self.meta["vote_type"] == "approval":
             (_, project_data), *_ = self.projects.items()
@@ -378,12 +621,14 @@ class ModifyPBFiles:
                     del project_data["score"]
                 self.modified = True
 
+    @modification_step("meta")
     def modify_mechanical_turk_files(self):
         self.meta["language"] = "en"
         self.meta["country"] = "Worldwide"
         self.meta["experimental"] = "1"
         self.modified = True
 
+    @modification_step("meta")
     def modify_zurich_files(self):
         for date in ["date_begin", "date_end"]:
             file_date = self.meta[date]
@@ -394,6 +639,7 @@ class ModifyPBFiles:
         self.meta["instance"] = self.filename.split("_")[-1].split(".")[0]
         self.meta["experimental"] = "1"
 
+    @modification_step("meta")
     def change_description(self):
         district = self.meta["subunit"]
         unit = self.meta["unit"]
@@ -402,6 +648,7 @@ class ModifyPBFiles:
         self.meta["description"] = f"District PB in {unit}, {district}"
         self.modified = True
 
+    @modification_step("meta")
     def get_all_used_comments(self):
         if self.meta.get("comment"):
             comment = self.meta["comment"]
@@ -423,6 +670,7 @@ class ModifyPBFiles:
         self.meta["comment"] = comment
         self.modified = True
 
+    @modification_step("meta")
     def change_type_into_choose_1(self):
         if self.meta["vote_type"] == "approval":
             if self.meta.get("max_length"):
@@ -458,6 +706,7 @@ class ModifyPBFiles:
         self.all_projects_fields.update(projects_fileds)
         self.all_votes_fields.update(votes_fields)
 
+    @modification_step("meta")
     def add_description(self):
         if not self.meta.get("description"):
             district = self.meta["district"]
@@ -474,6 +723,7 @@ class ModifyPBFiles:
             self.meta["description"] = description
             self.modified = True
 
+    @modification_step("meta")
     def add_currency(self):
         country = self.meta["country"]
         if country == "Poland":
@@ -486,6 +736,7 @@ class ModifyPBFiles:
             raise RuntimeError(f"I dont know this country: {country}")
         self.meta["currency"] = currency
 
+    @modification_step("meta", "projects")
     def add_fully_funded(self):
         if self.meta.get("fully_funded"):
             return
@@ -497,34 +748,33 @@ class ModifyPBFiles:
             logger.info(f"Added fully funded tag to {self.filename}")
             self.modified = True
 
+    @modification_step("meta")
     def change_year_into_dates(self):
         year = self.meta.pop("year")
         self.meta["date_begin"] = year
         self.meta["date_end"] = year
 
-    def change_voters_sex(self):
-        new_votes = {}
-        for voter, voter_dict in self.votes.items():
-            new_voter_dict = deepcopy(voter_dict)
-            if voter_dict["sex"] == "K":
-                new_voter_dict["sex"] = "F"
-            new_votes[voter] = new_voter_dict
-        self.votes = new_votes
-
-    def remove_projects_with_no_votes(self):
-        self.projects = {
-            project_id: project_dict
-            for project_id, project_dict in self.projects.items()
-            if int(project_dict["votes"] or 0) != 0
-        }
-
-    def remove_projects_with_no_cost(self):
-        self.projects = {
-            project_id: project_dict
-            for project_id, project_dict in self.projects.items()
-            if int(project_dict["cost"] or 0) != 0
-        }
-
+    # this step and the two below do not mark file as modified (as before they
+    # were registered), use `save_all` to save files changed only by them
+    @modification_step("votes", per_row=True)
+    def change_voters_sex(self, voter_id, vote):
+        if vote["sex"] == "K":
+            vote["sex"] = "F"
+        return vote
+
+    @modification_step("projects", per_row=True)
+    def remove_projects_with_no_votes(self, project_id, project_dict):
+        if int(project_dict["votes"] or 0) == 0:
+            return None
+        return project_dict
+
+    @modification_step("projects", per_row=True)
+    def remove_projects_with_no_cost(self, project_id, project_dict):
+        if int(project_dict["cost"] or 0) == 0:
+            return None
+        return project_dict
+
+    @modification_step("meta", "projects")
     def calculate_selected_from_budget(self):
         # be sure projects are sorted by score!
         self.projects = utils.sort_projects_by_results(self.projects)
@@ -539,8 +789,9 @@ class ModifyPBFiles:
                 budget -= project_cost
             self.projects[project_id]["selected"] = selected
 
-    def add_selected_to_projects_section(self, idx):
-        if idx == 0:
+    @modification_step("projects")
+    def add_selected_to_projects_section(self):
+        if getattr(self, "project_selected_mapping", None) is None:
             country = "Poland"
             city = "Kraków"
             year = "2019"
@@ -554,16 +805,22 @@ class ModifyPBFiles:
             project_dict["selected"] = selected
             self.projects[project] = project_dict
 
-    def replace_semicolons_in_votes(self):
-        for vote, vote_dict in self.votes.items():
-            input_vote = vote_dict["vote"]
-            changed_vote = input_vote.replace(";", ",")
-            self.votes[vote]["vote"] = changed_vote
+    # does not mark file as modified, see `change_voters_sex`
+    @modification_step("votes", per_row=True)
+    def replace_semicolons_in_votes(self, voter_id, vote):
+        if ";" in vote["vote"]:
+            vote["vote"] = vote["vote"].replace(";", ",")
+        return vote
+
+    def iterate_votes(self):
+        if self.load_votes:
+            return self.votes.items()
+        return utils.iterate_pb_votes(self.pb_file)
 
     def write_votes_section(self, writer):
         writer.writerow(["VOTES"])
         save_headers = True
-        for voter_id, vote in self.votes.items():
+        for voter_id, vote in self.iterate_votes():
             sorted_fields = self.sort_votes_fields(vote)
             if save_headers:
                 votes_headers = list(sorted_fields.keys())
@@ -624,14 +881,15 @@ class ModifyPBFiles:
             self.write_votes_section(writer)
 
     def run_pre_iteration(self):
-        self.comments = collections.defaultdict(list)
-        self.counter = []
+        self.all_global_data = []
+        self.all_comments = collections.defaultdict(list)
+        self.all_counter = []
 
     def run_post_iteration(self):
-        # print("hakuna!", len(self.counter))
-        # for desc, instance in self.counter:
+        # print("hakuna!", len(self.all_counter))
+        # for desc, instance in self.all_counter:
         #     print(desc, instance)
-        for comment, files in self.comments.items():
+        for comment, files in self.all_comments.items():
             print(comment, files, sep="\n")
 
     def start(self):
@@ -640,5 +898,43 @@ class ModifyPBFiles:
         self.run_post_iteration()
 
 
-mpbf = ModifyPBFiles()
-mpbf.start()
+@click.command()
+@click.option(
+    "--steps",
+    "-s",
+    multiple=True,
+    help="Step to run, can be repeated (default: SELECTED_STEPS).",
+)
+@click.option("--input", "input_files_path", help="Glob pattern of .pb files.")
+@click.option("--output", "output_files_path", help="Output directory.")
+@click.option("--processes", "-p", default=1, show_default=True)
+@click.option("--use-cache", is_flag=True, help="Use binary cache of parsed files.")
+@click.option("--save-all", is_flag=True, help="Save also not modified files.")
+@click.option("--list-steps", is_flag=True, help="List available steps and exit.")
+def cli(
+    steps,
+    input_files_path,
+    output_files_path,
+    processes,
+    use_cache,
+    save_all,
+    list_steps,
+):
+    if list_steps:
+        for step in MODIFICATION_STEPS.values():
+            row = ", per row" if step.per_row else ""
+            click.echo(f"{step.name} ({', '.join(step.sections)}{row})")
+        return
+    mpbf = ModifyPBFiles(
+        input_files_path=input_files_path,
+        output_files_path=output_files_path,
+        steps=list(steps) or None,
+        use_cache=use_cache,
+        processes=processes,
+        save_all=save_all,
+    )
+    mpbf.start()
+
+
+if __name__ == "__main__":
+    cli()
@@ -2,6 +2,8 @@ import os
 from dataclasses import dataclass
 
 import helpers.utilities as utils
+from helpers import checkpoints, http_cache
+from process_data.pipeline_context import PipelineContext
 
 
 @dataclass(kw_only=True)
@@ -10,6 +12,8 @@ class BaseConfig:
     unit: str
     instance: int
     subdistricts: bool = False
+    # objects shared between stages of `run_it`, JSON files are used if None
+    context: PipelineContext = None
 
     def __post_init__(self):
         self.logger = utils.create_logger()
@@ -17,20 +21,71 @@ class BaseConfig:
         self.output_file_name_mapping = getattr(
             self, "output_file_name_mapping", {}
         )
+        # district_upper -> path to .pb file, see `district_upper_file_path`
+        self.district_file_paths = (
+            self.context.district_file_paths if self.context is not None else {}
+        )
+        # files written by the stage besides JSON objects, see `output_file`
+        self.output_files = []
+
+    def output_file(self, path):
+        """Declare a file written by the stage and return its path. Declared
+        files are outputs of the stage in incremental runs."""
+        self.output_files.append(path)
+        return path
+
+    @property
+    def http_cache(self):
+        """Cache of pages scraped for the unit (`data/<unit>/.http_cache`)."""
+        return http_cache.get_cache(self.unit)
 
-    def save_mappings_as_jsons(self, objects):
+    def save_mappings_as_jsons(self, objects, per_district=()):
+        """Pass objects to the next stages and save them as JSON files.
+        Objects named in `per_district` hold records grouped per district
+        and are saved as compressed checkpoints (see helpers/checkpoints)."""
+        if self.context is not None:
+            self.context.update(objects)
+            if not self.context.save_jsons:
+                return
         self.logger.info("Saving JSON files...")
         for obj_name, obj in objects.items():
             filepath = utils.create_json_filepath(
                 self.country, self.unit, self.instance, obj_name
             )
-            utils.save_dict_as_json(obj, filepath)
+            checkpoints.save(filepath, obj, per_district=obj_name in per_district)
             self.logger.info(f"{os.path.basename(filepath)} file saved.")
 
     def get_json_file(self, file_name):
-        return utils.name_and_load_dict_as_json(
+        if self.context is not None and file_name in self.context:
+            return self.context[file_name]
+        filepath = utils.create_json_filepath(
             self.country, self.unit, self.instance, file_name
         )
+        return checkpoints.load(filepath)
 
     def output_district_name(self, district_upper):
         return self.output_file_name_mapping.get(district_upper, district_upper)
+
+    def district_upper_file_path(self, district_upper):
+        """Path to .pb file of the district, CITYWIDE is the unit file. Paths
+        are kept in a table shared by stages of the run (`PipelineContext`)."""
+        if district_upper not in self.district_file_paths:
+            if district_upper == "CITYWIDE":
+                path = utils.get_path_to_file(self.unit_file_name)
+            else:
+                path = utils.get_path_to_file(
+                    self.unit_file_name, self.output_district_name(district_upper)
+                )
+            self.district_file_paths[district_upper] = path
+        return self.district_file_paths[district_upper]
+
+    def district_file_path(self, district, subdistrict=None):
+        """Path to .pb file of the (sub)district from projects / votes data."""
+        if district.upper() == "CITYWIDE":
+            return self.district_upper_file_path("CITYWIDE")
+        district_upper = utils.change_district_into_name(district)
+        if self.subdistricts:
+            district_upper = utils.create_district_subdistrict_upper(
+                district_upper, subdistrict
+            )
+        return self.district_upper_file_path(district_upper)
@@ -24,9 +24,11 @@ all_data = {
         # --- Vote Data Configuration ---
         "get_votes": {
             "excel_filename": "sample_votes",  # Excel file name (without extension) containing vote data
+            # "csv_settings": {"delimiter": ";", "encoding": "utf-8"},  # Used if excel_filename ends with `.csv`, add "convert_numbers": True to read numbers as floats
             "data_dir": "2025",  # Directory for storing vote data (relative to `data/`)
             "only_valid_votes": False,  # Set to True if the file contains only valid votes
             "valid_value": "valid",  # Keyword in the file that marks votes as valid
+            # "input_sorted": True,  # Set to True if rows of every voter are already next to each other
             "columns_mapping": {  # Maps file column headers to internal keys
                 "voter_id": "Voter ID",  # Unique identifier for the voter
                 "sex": "Sex",  # Voter's gender
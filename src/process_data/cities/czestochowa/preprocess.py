@@ -180,7 +180,7 @@ class Preprocess(BaseConfig):
             filename, self.unit, self.data_dir, ext="xlsx"
         )
 
-        df.to_excel(output_file_path, index=False)
+        df.to_excel(self.output_file(output_file_path), index=False)
 
         self.logger.info(f"Data successfully saved to {output_file_path}")
 
@@ -6,7 +6,6 @@ from dataclasses import dataclass
 import helpers.utilities as utils
 import openpyxl
 import pypdf
-from process_data.cities.gdynia.postprocess import register_gdynia_postprocess
 from process_data.base_config import BaseConfig
 from process_data.models import ProjectItem
 import xlrd
@@ -349,13 +348,6 @@ class GetProjects(BaseConfig):
                         self.project_citywide_pool_mapping[project_id] = pool
 
     def start(self):
-        if self.instance >= 2020:
-            register_gdynia_postprocess(
-                country=self.country,
-                unit=self.unit,
-                instance=int(self.instance),
-            )
-
         if self.instance >= 2021:
             self.get_data_from_2021_plus_files()
             self.create_district_upper_mapping()
@@ -367,7 +359,9 @@ class GetProjects(BaseConfig):
                 "project_citywide_pool_mapping": self.project_citywide_pool_mapping,
                 "district_upper_district_mapping": self.district_upper_district_mapping,
             }
-            self.save_mappings_as_jsons(objects)
+            self.save_mappings_as_jsons(
+                objects, per_district=["projects_data_per_district"]
+            )
             return
 
         import docx
@@ -383,4 +377,6 @@ class GetProjects(BaseConfig):
             "project_subdistrict_mapping": self.project_subdistrict_mapping,
             "district_upper_district_mapping": self.district_upper_district_mapping,
         }
-        self.save_mappings_as_jsons(objects)
+        self.save_mappings_as_jsons(
+            objects, per_district=["projects_data_per_district"]
+        )
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-import atexit
 import csv
+import itertools
+import os
+from collections.abc import Iterable
 from pathlib import Path
 
 from pabulib.checker import flds
@@ -88,7 +90,14 @@ def _ordered_fields(fields: list[str], order: list[str]) -> list[str]:
     return [field for field in order if field in fields]
 
 
-def _write_pb(path: Path, meta: dict, projects: dict, votes: dict) -> None:
+def _write_pb(
+    path: Path, meta: dict, projects: dict, votes: Iterable[tuple[str, dict]]
+) -> None:
+    """Write .pb file, `votes` is an iterable of `(voter_id, vote_data)` pairs.
+
+    Votes may be streamed from `path` itself, so the file is written to a
+    temporary file first and moved in place at the end.
+    """
     if not projects:
         raise RuntimeError(f"No projects to write for {path}")
 
@@ -96,14 +105,18 @@ def _write_pb(path: Path, meta: dict, projects: dict, votes: dict) -> None:
         list(next(iter(projects.values())).keys()), flds.PROJECTS_FIELDS_ORDER
     )
 
-    if votes:
+    votes = iter(votes)
+    first_vote = next(votes, None)
+    if first_vote:
         vote_fields = _ordered_fields(
-            ["voter_id", *list(next(iter(votes.values())).keys())], flds.VOTES_FIELDS_ORDER
+            ["voter_id", *list(first_vote[1].keys())], flds.VOTES_FIELDS_ORDER
         )
+        votes = itertools.chain([first_vote], votes)
     else:
         vote_fields = ["voter_id", "vote"]
 
-    with path.open("w", newline="", encoding="utf-8") as file_:
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with tmp_path.open("w", newline="", encoding="utf-8") as file_:
         writer = csv.writer(file_, delimiter=";")
 
         writer.writerow(["META"])
@@ -119,7 +132,7 @@ def _write_pb(path: Path, meta: dict, projects: dict, votes: dict) -> None:
 
         writer.writerow(["VOTES"])
         writer.writerow(vote_fields)
-        for voter_id, vote_data in votes.items():
+        for voter_id, vote_data in votes:
             row = []
             for field in vote_fields:
                 if field == "voter_id":
@@ -127,6 +140,7 @@ def _write_pb(path: Path, meta: dict, projects: dict, votes: dict) -> None:
                 else:
                     row.append(vote_data.get(field, ""))
             writer.writerow(row)
+    os.replace(tmp_path, path)
 
 
 def _selected_values(projects: dict) -> set[int]:
@@ -139,10 +153,10 @@ def _selected_values(projects: dict) -> set[int]:
     return values
 
 
-def _normalize_meta(meta: dict, projects: dict, votes: dict) -> dict:
+def _normalize_meta(meta: dict, projects: dict, num_votes: int) -> dict:
     fixed_meta = dict(meta)
     fixed_meta["num_projects"] = len(projects)
-    fixed_meta["num_votes"] = len(votes)
+    fixed_meta["num_votes"] = num_votes
     fixed_meta["min_length"] = 1
     fixed_meta["max_length"] = min(3, len(projects))
 
@@ -195,16 +209,16 @@ def _apply_fully_funded(meta: dict, projects: dict) -> dict:
     return fixed_meta
 
 
-def _apply_online_voting_method(votes: dict, instance: int) -> dict:
+def _apply_online_voting_method(
+    votes: Iterable[tuple[str, dict]], instance: int
+) -> Iterable[tuple[str, dict]]:
     if int(instance) not in ONLINE_ONLY_VOTING_INSTANCES:
         return votes
 
-    fixed_votes = {}
-    for voter_id, vote_data in votes.items():
-        updated_vote = dict(vote_data)
-        updated_vote["voting_method"] = "internet"
-        fixed_votes[voter_id] = updated_vote
-    return fixed_votes
+    return (
+        (voter_id, {**vote_data, "voting_method": "internet"})
+        for voter_id, vote_data in votes
+    )
 
 
 def _split_citywide_vote(vote: str, pool_mapping: dict[str, str], pool_name: str) -> str:
@@ -218,15 +232,21 @@ def _split_citywide_vote(vote: str, pool_mapping: dict[str, str], pool_name: str
     return ",".join(selected)
 
 
-def split_citywide_file(country: str, unit: str, instance: int, **_) -> None:
+def split_citywide_file(
+    country: str, unit: str, instance: int, context=None, **_
+) -> None:
     root_path = Path("src/output") / f"{country}_{unit}_{instance}_.pb"
     if not root_path.exists():
         return
 
-    meta, projects, votes, _, _ = utils.load_pb_file(str(root_path))
-    pool_mapping = utils.name_and_load_dict_as_json(
-        country, unit, instance, "project_citywide_pool_mapping"
-    )
+    meta, projects, _, _, _ = utils.load_pb_file(str(root_path), skip_votes=True)
+    if context is not None and "project_citywide_pool_mapping" in context:
+        pool_mapping = context["project_citywide_pool_mapping"]
+    else:
+        # get_projects was skipped (incremental run), its JSON files are saved
+        pool_mapping = utils.name_and_load_dict_as_json(
+            country, unit, instance, "project_citywide_pool_mapping"
+        )
     output_config = CITYWIDE_OUTPUTS[int(instance)]
 
     citywide_projects = {}
@@ -238,7 +258,7 @@ def split_citywide_file(country: str, unit: str, instance: int, **_) -> None:
         }
 
     citywide_votes = {pool_name: {} for pool_name in output_config}
-    for voter_id, vote_data in votes.items():
+    for voter_id, vote_data in utils.iterate_pb_votes(str(root_path)):
         for pool_name in output_config:
             split_vote = _split_citywide_vote(vote_data.get("vote", ""), pool_mapping, pool_name)
             if not split_vote:
@@ -249,11 +269,11 @@ def split_citywide_file(country: str, unit: str, instance: int, **_) -> None:
 
     for pool_name, config in output_config.items():
         pool_projects = citywide_projects[pool_name]
-        pool_votes = _apply_online_voting_method(citywide_votes[pool_name], instance)
+        pool_votes = citywide_votes[pool_name]
         if not pool_projects:
             continue
 
-        pool_meta = _normalize_meta(meta, pool_projects, pool_votes)
+        pool_meta = _normalize_meta(meta, pool_projects, len(pool_votes))
         pool_meta["description"] = config["description"]
         pool_meta["budget"] = config["budget"]
         pool_meta["rule"] = "greedy-no-skip"
@@ -269,7 +289,12 @@ def split_citywide_file(country: str, unit: str, instance: int, **_) -> None:
             if not suffix
             else Path("src/output") / f"{country}_{unit}_{instance}_{suffix}.pb"
         )
-        _write_pb(output_path, pool_meta, pool_projects, pool_votes)
+        _write_pb(
+            output_path,
+            pool_meta,
+            pool_projects,
+            _apply_online_voting_method(pool_votes.items(), instance),
+        )
 
     if all(config["filename"] for config in output_config.values()) and root_path.exists():
         root_path.unlink()
@@ -280,10 +305,10 @@ def fix_local_meta(country: str, unit: str, instance: int, **_) -> None:
     pattern = f"{country}_{unit}_{instance}_*.pb"
 
     for path in base_path.glob(pattern):
-        meta, projects, votes, _, _ = utils.load_pb_file(str(path))
+        meta, projects, _, _, _ = utils.load_pb_file(str(path), skip_votes=True)
         projects = _reorder_projects(path, projects)
-        votes = _apply_online_voting_method(votes, instance)
-        fixed_meta = _normalize_meta(meta, projects, votes)
+        votes = _apply_online_voting_method(utils.iterate_pb_votes(str(path)), instance)
+        fixed_meta = _normalize_meta(meta, projects, utils.count_pb_votes(str(path)))
         fixed_meta = _apply_overrides(path, fixed_meta)
         _write_pb(path, fixed_meta, projects, votes)
 
@@ -296,10 +321,10 @@ def fix_generic_files(country: str, unit: str, instance: int, **_) -> None:
         paths.append(root_path)
 
     for path in paths:
-        meta, projects, votes, _, _ = utils.load_pb_file(str(path))
+        meta, projects, _, _, _ = utils.load_pb_file(str(path), skip_votes=True)
         projects = _reorder_projects(path, projects)
-        votes = _apply_online_voting_method(votes, instance)
-        fixed_meta = _normalize_meta(meta, projects, votes)
+        votes = _apply_online_voting_method(utils.iterate_pb_votes(str(path)), instance)
+        fixed_meta = _normalize_meta(meta, projects, utils.count_pb_votes(str(path)))
         fixed_meta = _apply_fully_funded(fixed_meta, projects)
         fixed_meta = _apply_overrides(path, fixed_meta)
         _write_pb(path, fixed_meta, projects, votes)
@@ -316,10 +341,10 @@ def fix_citywide_meta(country: str, unit: str, instance: int, **_) -> None:
         if not path.exists():
             continue
 
-        meta, projects, votes, _, _ = utils.load_pb_file(str(path))
+        meta, projects, _, _, _ = utils.load_pb_file(str(path), skip_votes=True)
         projects = _reorder_projects(path, projects)
-        votes = _apply_online_voting_method(votes, instance)
-        fixed_meta = _normalize_meta(meta, projects, votes)
+        votes = _apply_online_voting_method(utils.iterate_pb_votes(str(path)), instance)
+        fixed_meta = _normalize_meta(meta, projects, utils.count_pb_votes(str(path)))
         fixed_meta["description"] = config["description"]
         fixed_meta["budget"] = config["budget"]
         fixed_meta["rule"] = "greedy-no-skip"
@@ -338,27 +363,16 @@ def fix_citywide_meta(country: str, unit: str, instance: int, **_) -> None:
             stale_path.unlink()
 
 
-def run_gdynia_postprocess(country: str, unit: str, instance: int) -> None:
+def run_gdynia_postprocess(
+    country: str, unit: str, instance: int, context=None
+) -> None:
     if int(instance) not in ONLINE_ONLY_VOTING_INSTANCES:
         return
     if int(instance) in CITYWIDE_OUTPUTS:
-        split_citywide_file(country=country, unit=unit, instance=instance)
+        split_citywide_file(
+            country=country, unit=unit, instance=instance, context=context
+        )
         fix_local_meta(country=country, unit=unit, instance=instance)
         fix_citywide_meta(country=country, unit=unit, instance=instance)
     else:
         fix_generic_files(country=country, unit=unit, instance=instance)
-
-
-def register_gdynia_postprocess(country: str, unit: str, instance: int) -> None:
-    if int(instance) not in ONLINE_ONLY_VOTING_INSTANCES:
-        return
-    if getattr(register_gdynia_postprocess, "_registered", False):
-        return
-
-    atexit.register(
-        run_gdynia_postprocess,
-        country=country,
-        unit=unit,
-        instance=int(instance),
-    )
-    register_gdynia_postprocess._registered = True
@@ -227,8 +227,10 @@ class Preprocess(BaseConfig):
 
     def start(self):
         self.logger.info("Running preprocessing...")
-        excel_path = utils.get_path_to_file_by_unit(
-            self.excel_filename, self.unit, self.data_dir, ext="xlsx"
+        excel_path = self.output_file(
+            utils.get_path_to_file_by_unit(
+                self.excel_filename, self.unit, self.data_dir, ext="xlsx"
+            )
         )
         if os.path.exists(excel_path):
             self.logger.info(
@@ -148,5 +148,5 @@ class Preprocess(BaseConfig):
         output_path = utils.get_path_to_file_by_unit(
             self.output_excel_path, self.unit, self.data_dir, ext="xlsx"
         )
-        df.to_excel(output_path, index=False)
+        df.to_excel(self.output_file(output_path), index=False)
         self.save_objects()
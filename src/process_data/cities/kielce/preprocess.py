@@ -9,6 +9,11 @@ import helpers.settings as helper_settings
 import helpers.utilities as utils
 from process_data.base_config import BaseConfig
 
+# only project cards are parsed from projects page
+PROJECT_CARDS = utils.html_target(
+    "div", css_class="budzetobywatelski-prezentacja-projektow-2025"
+)
+
 
 @dataclass(kw_only=True)
 class Preprocess(BaseConfig):
@@ -72,7 +77,9 @@ class Preprocess(BaseConfig):
             self.unit, extra_dir=self.data_dir
         )
         os.makedirs(output_dir, exist_ok=True)
-        return os.path.join(output_dir, f"{filename}.xlsx").replace("\\", "/")
+        return self.output_file(
+            os.path.join(output_dir, f"{filename}.xlsx").replace("\\", "/")
+        )
 
     def load_votes_source(self):
         votes_df = pd.read_excel(self.get_source_votes_path())
@@ -97,7 +104,9 @@ class Preprocess(BaseConfig):
         return project_districts.to_dict()
 
     def parse_projects_page(self, project_district_lookup):
-        soup = utils.get_soup(self.projects_url)
+        soup = utils.get_soup(
+            self.projects_url, cache=self.http_cache, target=PROJECT_CARDS
+        )
         projects = []
 
         for project_card in soup.select("div.budzetobywatelski-prezentacja-projektow-2025"):
@@ -219,7 +219,7 @@ class Preprocess(BaseConfig):
         path = utils.get_path_to_file_by_unit(
             filename, self.unit, self.data_dir, ext="xlsx"
         )
-        df.to_excel(path, index=False)
+        df.to_excel(self.output_file(path), index=False)
         self.logger.info(f"Saved {len(df)} rows to {filename}.xlsx")
 
     def start(self):
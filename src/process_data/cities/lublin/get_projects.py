@@ -6,7 +6,6 @@ from dataclasses import field
 
 import helpers.utilities as utils
 from process_data.base_config import BaseConfig
-from process_data.cities.lublin.postprocess import register_lublin_postprocess
 from process_data.cities.lublin.projects_costs import get_projects_costs
 
 OFFICIAL_SELECTED_PROJECTS_2020 = {
@@ -233,11 +232,6 @@ class GetProjects(BaseConfig):
             self.district_upper_district_mapping[district_upper] = district
 
     def start(self):
-        register_lublin_postprocess(
-            country=self.country,
-            unit=self.unit,
-            instance=int(self.instance),
-        )
         data = self.get_sheet_data()
         self.iterate_through_rows(data)
         projects_costs = get_projects_costs()
@@ -249,4 +243,6 @@ class GetProjects(BaseConfig):
             "project_district_mapping": self.project_district_mapping,
             "district_upper_district_mapping": self.district_upper_district_mapping,
         }
-        self.save_mappings_as_jsons(objects)
+        self.save_mappings_as_jsons(
+            objects, per_district=["projects_data_per_district"]
+        )
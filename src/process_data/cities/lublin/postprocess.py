@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import atexit
 import csv
 from pathlib import Path
 
@@ -116,19 +115,8 @@ def fix_citywide_meta(country: str, unit: str, instance: int, **_) -> None:
         _write_pb(path, fixed_meta, projects, votes)
 
 
-def run_lublin_postprocess(country: str, unit: str, instance: int) -> None:
+def run_lublin_postprocess(
+    country: str, unit: str, instance: int, context=None
+) -> None:
     fix_district_descriptions(country=country, unit=unit, instance=instance)
     fix_citywide_meta(country=country, unit=unit, instance=instance)
-
-
-def register_lublin_postprocess(country: str, unit: str, instance: int) -> None:
-    if getattr(register_lublin_postprocess, "_registered", False):
-        return
-
-    atexit.register(
-        run_lublin_postprocess,
-        country=country,
-        unit=unit,
-        instance=int(instance),
-    )
-    register_lublin_postprocess._registered = True
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-import atexit
 import csv
+import itertools
+import os
+from collections.abc import Iterable
 from pathlib import Path
 
 from pabulib.checker import flds
@@ -32,15 +34,25 @@ def _ordered_fields(fields: list[str], order: list[str]) -> list[str]:
     return [field for field in order if field in fields]
 
 
-def _write_pb(path: Path, meta: dict, projects: dict, votes: dict) -> None:
+def _write_pb(
+    path: Path, meta: dict, projects: dict, votes: Iterable[tuple[str, dict]]
+) -> None:
+    """Write .pb file, `votes` is an iterable of `(voter_id, vote_data)` pairs.
+
+    Votes may be streamed from `path` itself, so the file is written to a
+    temporary file first and moved in place at the end.
+    """
+    votes = iter(votes)
+    first_vote = next(votes)
     project_fields = _ordered_fields(
         list(next(iter(projects.values())).keys()), flds.PROJECTS_FIELDS_ORDER
     )
     vote_fields = _ordered_fields(
-        ["voter_id", *list(next(iter(votes.values())).keys())], flds.VOTES_FIELDS_ORDER
+        ["voter_id", *list(first_vote[1].keys())], flds.VOTES_FIELDS_ORDER
     )
 
-    with path.open("w", newline="", encoding="utf-8") as file_:
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with tmp_path.open("w", newline="", encoding="utf-8") as file_:
         writer = csv.writer(file_, delimiter=";")
 
         writer.writerow(["META"])
@@ -56,7 +68,7 @@ def _write_pb(path: Path, meta: dict, projects: dict, votes: dict) -> None:
 
         writer.writerow(["VOTES"])
         writer.writerow(vote_fields)
-        for voter_id, vote_data in votes.items():
+        for voter_id, vote_data in itertools.chain([first_vote], votes):
             row = []
             for field in vote_fields:
                 if field == "voter_id":
@@ -64,6 +76,7 @@ def _write_pb(path: Path, meta: dict, projects: dict, votes: dict) -> None:
                 else:
                     row.append(vote_data.get(field, ""))
             writer.writerow(row)
+    os.replace(tmp_path, path)
 
 
 def _selected_values(projects: dict) -> set[int]:
@@ -107,9 +120,9 @@ def fix_comments(country: str, unit: str, instance: int, **_) -> None:
     pattern = f"{country}_{unit}_{instance}_*.pb"
 
     for path in base_path.glob(pattern):
-        meta, projects, votes, _, _ = utils.load_pb_file(str(path))
+        meta, projects, _, _, _ = utils.load_pb_file(str(path), skip_votes=True)
         fixed_meta = _apply_comment_policy(meta, projects)
-        _write_pb(path, fixed_meta, projects, votes)
+        _write_pb(path, fixed_meta, projects, utils.iterate_pb_votes(str(path)))
 
 
 def fix_citywide_meta(country: str, unit: str, instance: int, **_) -> None:
@@ -117,7 +130,7 @@ def fix_citywide_meta(country: str, unit: str, instance: int, **_) -> None:
     pattern = f"{country}_{unit}_{instance}_*CITYWIDE_*.pb"
 
     for path in base_path.glob(pattern):
-        meta, projects, votes, _, _ = utils.load_pb_file(str(path))
+        meta, projects, _, _, _ = utils.load_pb_file(str(path), skip_votes=True)
         citywide_size = _infer_citywide_size(path, meta)
         if citywide_size is None:
             continue
@@ -127,7 +140,7 @@ def fix_citywide_meta(country: str, unit: str, instance: int, **_) -> None:
         fixed_meta["subunit"] = citywide_size
         fixed_meta["instance"] = int(instance)
         fixed_meta["num_projects"] = len(projects)
-        fixed_meta["num_votes"] = len(votes)
+        fixed_meta["num_votes"] = utils.count_pb_votes(str(path))
         fixed_meta.pop("district", None)
 
         try:
@@ -135,7 +148,7 @@ def fix_citywide_meta(country: str, unit: str, instance: int, **_) -> None:
         except KeyError:
             pass
 
-        _write_pb(path, fixed_meta, projects, votes)
+        _write_pb(path, fixed_meta, projects, utils.iterate_pb_votes(str(path)))
 
 
 def fix_green_budget_meta(country: str, unit: str, instance: int, **_) -> None:
@@ -143,33 +156,22 @@ def fix_green_budget_meta(country: str, unit: str, instance: int, **_) -> None:
     pattern = f"{country}_{unit}_{instance}_*ZIELONY_BUDZET*.pb"
 
     for path in base_path.glob(pattern):
-        meta, projects, votes, _, _ = utils.load_pb_file(str(path))
+        meta, projects, _, _, _ = utils.load_pb_file(str(path), skip_votes=True)
 
         fixed_meta = _apply_comment_policy(meta, projects)
         fixed_meta["description"] = f"Municipal PB in {unit}, Green Budget"
         fixed_meta["subunit"] = "Green Budget"
         fixed_meta["instance"] = int(instance)
         fixed_meta["num_projects"] = len(projects)
-        fixed_meta["num_votes"] = len(votes)
+        fixed_meta["num_votes"] = utils.count_pb_votes(str(path))
         fixed_meta.pop("district", None)
 
-        _write_pb(path, fixed_meta, projects, votes)
+        _write_pb(path, fixed_meta, projects, utils.iterate_pb_votes(str(path)))
 
 
-def run_poznan_postprocess(country: str, unit: str, instance: int) -> None:
+def run_poznan_postprocess(
+    country: str, unit: str, instance: int, context=None
+) -> None:
     fix_comments(country=country, unit=unit, instance=instance)
     fix_citywide_meta(country=country, unit=unit, instance=instance)
     fix_green_budget_meta(country=country, unit=unit, instance=instance)
-
-
-def register_poznan_postprocess(country: str, unit: str, instance: int) -> None:
-    if getattr(register_poznan_postprocess, "_registered", False):
-        return
-
-    atexit.register(
-        run_poznan_postprocess,
-        country=country,
-        unit=unit,
-        instance=int(instance),
-    )
-    register_poznan_postprocess._registered = True
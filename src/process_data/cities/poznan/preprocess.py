@@ -251,6 +251,8 @@ class Preprocess(BaseConfig):
             self.votes_filename, self.unit, extra_dir=self.data_dir, ext="csv"
         )
 
+        for path in (projects_xlsx, projects_csv, votes_xlsx, votes_csv):
+            self.output_file(path)
         projects_df.to_excel(projects_xlsx, index=False)
         projects_df.to_csv(projects_csv, index=False, encoding="utf-8")
         votes_df.to_excel(votes_xlsx, index=False)
@@ -43,7 +43,9 @@ class Preprocess(BaseConfig):
             self.unit, extra_dir=self.data_dir
         )
         os.makedirs(output_dir, exist_ok=True)
-        return os.path.join(output_dir, f"{filename}.xlsx").replace("\\", "/")
+        return self.output_file(
+            os.path.join(output_dir, f"{filename}.xlsx").replace("\\", "/")
+        )
 
     def normalize_text(self, value):
         text = str(value or "").replace("\xa0", " ").strip().lower()
@@ -55,8 +55,9 @@ class GetProjects(BaseGetProjects):
 
     def start(self):
         self.prepare_excel_sheet()
-        self.handle_columns_indexes()
-        self.iterate_through_projects()
+        with self.sheet:
+            self.handle_columns_indexes()
+            self.iterate_through_projects()
         if not self.preserve_official_results:
             self.update_projects_with_counted_results()
         self.create_district_upper_mapping()
@@ -67,4 +68,6 @@ class GetProjects(BaseGetProjects):
             "project_district_mapping": self.project_district_mapping,
             "district_upper_district_mapping": self.district_upper_district_mapping,
         }
-        self.save_mappings_as_jsons(objects)
+        self.save_mappings_as_jsons(
+            objects, per_district=["projects_data_per_district"]
+        )
@@ -155,7 +155,7 @@ class Preprocess(BaseConfig):
         output_path = utils.get_path_to_file_by_unit(
             filename, self.unit, self.data_dir, ext="xlsx"
         )
-        df.to_excel(output_path, index=False)
+        df.to_excel(self.output_file(output_path), index=False)
 
     def start(self):
         self.logger.info("Running preprocessing...")
@@ -119,7 +119,9 @@ class Preprocess(BaseConfig):
     def get_output_path(self, filename):
         output_dir = helper_settings.get_path_to_excel_files(self.unit, extra_dir=self.data_dir)
         os.makedirs(output_dir, exist_ok=True)
-        return os.path.join(output_dir, f"{filename}.xlsx").replace("\\", "/")
+        return self.output_file(
+            os.path.join(output_dir, f"{filename}.xlsx").replace("\\", "/")
+        )
 
     def save_projects(self, projects):
         columns = [
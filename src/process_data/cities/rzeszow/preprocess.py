@@ -83,7 +83,9 @@ class Preprocess(BaseConfig):
             self.unit, extra_dir=self.data_dir
         )
         os.makedirs(output_dir, exist_ok=True)
-        return os.path.join(output_dir, f"{filename}.xlsx").replace("\\", "/")
+        return self.output_file(
+            os.path.join(output_dir, f"{filename}.xlsx").replace("\\", "/")
+        )
 
     def normalize_category(self, category):
         if category == "KATEGORIA I":
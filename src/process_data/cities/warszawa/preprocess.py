@@ -13,7 +13,7 @@ Coordinates are extracted from the detailed project pages using the 'markersMap'
 
 Utilities used:
 - `utils.get_soup` for standard HTML fetching
-- `utils.get_soup_requests_with` for detail page parsing
+- `utils.get_soups` for fetching detail pages of a list page concurrently
 - `utils.create_json_filepath` and `utils.save_dict_as_json` for saving results
 """
 
@@ -26,6 +26,10 @@ from dataclasses import dataclass
 import helpers.utilities as utils
 from process_data.base_config import BaseConfig
 
+# only these parts of pages are parsed
+PROJECTS_LIST = utils.html_target("tbody", id="projects-list")
+MARKERS_MAP = utils.html_target("input", name="markersMap")
+
 
 @dataclass(kw_only=True)
 class Preprocess(BaseConfig):
@@ -60,6 +64,34 @@ class Preprocess(BaseConfig):
             self.logger.warning(f"Failed to extract coordinates: {e}")
         return "", ""
 
+    def get_projects_urls(self, projects_table):
+        """Return {project_id: url of project page} for list page rows."""
+        projects_urls = {}
+        for project in projects_table.find_all("tr"):
+            href_tag = project.find("a", class_="card__link")
+            if not href_tag or not href_tag.get("href"):
+                continue
+
+            href = href_tag.get("href")
+            full_url = f"https://bo.um.warszawa.pl{href}"
+
+            scope_and_number = project.find("div", class_="scope-and-number")
+            if scope_and_number:
+                raw_text = scope_and_number.text.strip()
+                match = re.search(r"(\d+)$", raw_text)
+                if match:
+                    project_id = int(match.group(1))
+                else:
+                    self.logger.warning(
+                        f"Could not extract project ID with regex from: '{raw_text}'"
+                    )
+                    continue
+            else:
+                self.logger.warning("No 'scope-and-number' div found in project row.")
+                continue
+            projects_urls[project_id] = full_url
+        return projects_urls
+
     def scrape_projects_coordinates(self):
         self.logger.info(f"Starting coordinate scraping for year: {self.instance}")
         coordinates_dict = {}
@@ -67,7 +99,7 @@ class Preprocess(BaseConfig):
         for page_no in itertools.count(start=1):
             url = self.create_project_list_url(page_no)
             self.logger.info(f"Fetching URL: {url}")
-            soup = utils.get_soup(url)
+            soup = utils.get_soup(url, cache=self.http_cache, target=PROJECTS_LIST)
             projects_table = soup.find("tbody", attrs={"id": "projects-list"})
 
             rows = projects_table.find_all("tr", recursive=False)
@@ -83,34 +115,17 @@ class Preprocess(BaseConfig):
             #     self.logger.warning("Page limit reached (debug limit = 2).")
             #     break
 
-            for project in projects_table.find_all("tr"):
-                href_tag = project.find("a", class_="card__link")
-                if not href_tag or not href_tag.get("href"):
-                    continue
-
-                href = href_tag.get("href")
-                full_url = f"https://bo.um.warszawa.pl{href}"
-                self.logger.debug(f"Scraping project page: {full_url}")
-                detail_soup = utils.get_soup_requests_with(full_url)
-
-                scope_and_number = project.find("div", class_="scope-and-number")
-                if scope_and_number:
-                    raw_text = scope_and_number.text.strip()
-                    match = re.search(r"(\d+)$", raw_text)
-                    if match:
-                        project_id = int(match.group(1))
-                    else:
-                        self.logger.warning(
-                            f"Could not extract project ID with regex from: '{raw_text}'"
-                        )
-                        continue
-                else:
-                    self.logger.warning(
-                        "No 'scope-and-number' div found in project row."
-                    )
-                    continue
-
-                lon, lat = self.get_coordinates(detail_soup)
+            projects_urls = self.get_projects_urls(projects_table)
+            # detail pages of the whole list page are fetched concurrently
+            coordinates = {}
+            for full_url, detail_soup in utils.get_soups(
+                projects_urls.values(), cache=self.http_cache, target=MARKERS_MAP
+            ):
+                self.logger.debug(f"Scraped project page: {full_url}")
+                coordinates[full_url] = self.get_coordinates(detail_soup)
+
+            for project_id, full_url in projects_urls.items():
+                lon, lat = coordinates[full_url]
                 if lon and lat:
                     coordinates_dict[project_id] = {"lat": lat, "lng": lon}
                 else:
@@ -124,8 +139,8 @@ class Preprocess(BaseConfig):
 
     def start(self):
         obj_name = "project_coordinates"
-        json_filepath = utils.create_json_filepath(
-            self.country, self.unit, self.instance, obj_name
+        json_filepath = self.output_file(
+            utils.create_json_filepath(self.country, self.unit, self.instance, obj_name)
         )
 
         if os.path.exists(json_filepath):
@@ -11,6 +11,16 @@ from helpers.mappings import wroclaw_mapping
 from process_data.base_config import BaseConfig
 from process_data.models import ProjectItem
 
+# only these parts of pages are parsed
+PROJECTS_LIST = utils.html_target("ul", css_class="listProjects")
+PROJECT_PAGE = [
+    utils.html_target(
+        ["div", "p"], css_class=("col-sm-3", "txtMapDesc", "boxProjectVotesCount")
+    ),
+    utils.html_target("script"),
+]
+VOTES_TABLES = utils.html_target("div", css_class="table-responsive")
+
 
 @dataclass
 class GetProjects(BaseConfig):
@@ -29,8 +39,20 @@ class GetProjects(BaseConfig):
         self.project_district_mapping = dict()
 
     def iterate_through_projects(self, project_list):
-        for project in project_list:
-            self.get_project_data(project)
+        projects = [self.get_project_data(project) for project in project_list]
+        projects = [project for project in projects if project]
+        # project pages are fetched concurrently and parsed as they come, a
+        # page can be linked from several items (e.g. project in two lists)
+        items_per_url = collections.defaultdict(list)
+        for item, _ in projects:
+            items_per_url[item.project_url].append(item)
+        for project_url, soup in utils.get_soups(
+            items_per_url, cache=self.http_cache, target=PROJECT_PAGE
+        ):
+            for item in items_per_url[project_url]:
+                self.get_data_from_project_url(item, soup)
+        for item, district in projects:
+            self.add_projects_to_mappings(item, district)
 
     def get_binary_status(self, status_txt):
         status_txt = status_txt.lower()
@@ -125,8 +147,11 @@ class GetProjects(BaseConfig):
 
         return item
 
-    def get_data_from_project_url(self, item):
-        soup = utils.get_soup(item.project_url)
+    def get_data_from_project_url(self, item, soup=None):
+        if soup is None:
+            soup = utils.get_soup(
+                item.project_url, cache=self.http_cache, target=PROJECT_PAGE
+            )
         item.district = self.get_neighborhood_from_project_url(soup)
         votes = soup.find("div", class_="boxProjectVotesCount").text
         votes = votes.replace("Głosów:", "")
@@ -135,6 +160,8 @@ class GetProjects(BaseConfig):
         return item
 
     def get_project_data(self, project):
+        """Return (item, district) from project list entry, data from
+        project page are added by `get_data_from_project_url`."""
         try:
             status_txt = project["class"][2]
         except IndexError:
@@ -156,7 +183,6 @@ class GetProjects(BaseConfig):
         labels = project.find_all("span", class_="boxLabel")
         item.project_url = project.find("a").get("href")
         project_type = labels[0].text.strip()
-        item = self.get_data_from_project_url(item)
         if project_type.lower() == "ponadosiedlowy":
             district = "CITYWIDE"
         elif project_type.lower() == "osiedlowy":
@@ -168,7 +194,7 @@ class GetProjects(BaseConfig):
             )
         item.add_cost(labels[-1].text.strip())
         item.category = self.handle_categories(labels[1:-1])
-        self.add_projects_to_mappings(item, district)
+        return item, district
 
     def add_projects_to_mappings(self, item, district):
         self.projects_data_per_district[district].append(vars(item))
@@ -185,7 +211,7 @@ class GetProjects(BaseConfig):
     def iterate_through_project_list_2022(self):
         for page_no in itertools.count(start=1):
             url = self.create_project_list_url(page_no)
-            soup = utils.get_soup(url)
+            soup = utils.get_soup(url, cache=self.http_cache, target=PROJECTS_LIST)
             project_list = soup.find("ul", class_="listProjects").find_all(
                 "li", class_="boxProjectHeader"
             )
@@ -197,7 +223,7 @@ class GetProjects(BaseConfig):
     def get_projects_votes_from_url(self):
         projects_votes = {}
         url = f"https://www.wroclaw.pl/wbo/wyniki-glosowania-wbo-{self.instance}"
-        soup = utils.get_soup(url)
+        soup = utils.get_soup(url, cache=self.http_cache, target=VOTES_TABLES)
         tables = soup.find_all("div", class_="table-responsive")
         for table in tables:
             table = table.find("tbody")
@@ -306,4 +332,6 @@ class GetProjects(BaseConfig):
             "project_district_mapping": self.project_district_mapping,
             "district_upper_district_mapping": self.district_upper_district_mapping,
         }
-        self.save_mappings_as_jsons(objects)
+        self.save_mappings_as_jsons(
+            objects, per_district=["projects_data_per_district"]
+        )
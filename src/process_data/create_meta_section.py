@@ -1,10 +1,10 @@
-from copy import deepcopy
 from dataclasses import dataclass
 from pathlib import Path
 
 from pabulib.checker import flds
 
 import helpers.utilities as utils
+from process_data import pb_writer
 from process_data.base_config import BaseConfig
 
 
@@ -18,6 +18,7 @@ class CreateMetaSections(BaseConfig):
             "output_file_name_mapping", {}
         )
         self.set_up_iterator()
+        self.load_projects()
 
         if self.metadata.get("subdistricts_mapping"):
             self.subdistricts_mapping = self.get_json_file(
@@ -35,12 +36,31 @@ class CreateMetaSections(BaseConfig):
             iterator = "district_upper_district_mapping"
         self.iterator = self.get_json_file(iterator)
 
+    def load_projects(self):
+        # loaded once (every district of lazy checkpoint is read once), it is
+        # needed for every file to check if it is fully funded
+        all_projects = self.get_json_file("projects_data_per_district")
+        self.all_projects = {
+            district: all_projects[district] for district in all_projects
+        }
+
+    def get_file_projects(self, district, subdistrict):
+        if district == "unit":
+            district = "CITYWIDE"
+        if self.subdistricts:
+            return self.all_projects[district][subdistrict]
+        for key in (district.upper(), district.title(), district):
+            if key in self.all_projects:
+                return self.all_projects[key]
+        raise KeyError(district)
+
     def add_metadata(self):
         self.logger.info("Creating METADATA sections...")
         if self.subdistricts:
             self.iterate_through_subdistricts()
         else:
             self.iterate_through_districts()
+        pb_writer.save_remaining_buffers()
         self.logger.info("METADATA sections created")
 
     def get_subdistrict_budget(self, district, subdistrict):
@@ -69,13 +89,12 @@ class CreateMetaSections(BaseConfig):
                 self.handle_file(district, district_upper, budget, subdistrict)
 
     def iterate_through_districts(self):
-        all_projects = self.get_json_file("projects_data_per_district")
         for district_upper, district in self.iterator.items():
             if (
                 district_upper == "CITYWIDE"
                 and "CITYWIDE" not in self.budgets
                 and "citywide" not in self.budgets
-                and "CITYWIDE" not in all_projects
+                and "CITYWIDE" not in self.all_projects
             ):
                 continue
             try:
@@ -85,21 +104,26 @@ class CreateMetaSections(BaseConfig):
             self.handle_file(district, district_upper, budget)
 
     def handle_file(self, district, district_upper, budget, subdistrict=None):
+        path_to_file = self.district_upper_file_path(district_upper)
         if district_upper == "CITYWIDE":
-            path_to_file = utils.get_path_to_file(self.unit_file_name)
             district = "unit"
+        pb_buffer = pb_writer.pop_buffer(path_to_file)
+        if pb_buffer:
+            counts = pb_buffer.num_projects, pb_buffer.num_votes
         else:
-            path_to_file = utils.get_path_to_file(
-                self.unit_file_name, self.output_district_name(district_upper)
-            )
-        metadata = self.create_metadata(path_to_file, district, budget, subdistrict)
+            # file was not created by CreateProjectsSections
+            counts = utils.count_projects_and_votes(path_to_file)
+        metadata = self.create_metadata(counts, district, budget, subdistrict)
         metadata = {
             key: metadata[key] for key in flds.META_FIELDS_ORDER if key in metadata
         }
         metadata_txt = "META\nkey;value\n"
         for key, value in metadata.items():
             metadata_txt += f"{key};{value}\n"
-        utils.prepend_line_at_the_beggining_of_file(metadata_txt, path_to_file)
+        if pb_buffer:
+            pb_buffer.save(metadata_txt)
+        else:
+            utils.prepend_line_at_the_beggining_of_file(metadata_txt, path_to_file)
 
     def create_subunit_value(self, metadata, district, subdistrict):
         if metadata.get("subdistrict_sizes"):
@@ -107,8 +131,9 @@ class CreateMetaSections(BaseConfig):
             return f"{district} | {subdistrict}\n"
         return subdistrict
 
-    def create_metadata(self, path_to_file, district, budget, subdistrict):
-        temp_meta = deepcopy(self.metadata)
+    def create_metadata(self, counts, district, budget, subdistrict):
+        # nested dicts are shared with self.metadata, they are not modified
+        temp_meta = dict(self.metadata)
         district_key = district
         district_comments = temp_meta.pop("district_comments", {}) or {}
         district_descriptions = temp_meta.pop("district_descriptions", {}) or {}
@@ -142,6 +167,7 @@ class CreateMetaSections(BaseConfig):
                 district_title = district.split(" ", 1)[1].strip().lower()
                 ruda_pool = True
             if temp_meta.get("district") and temp_meta["district"].get("description"):
+                temp_meta["district"] = dict(temp_meta["district"])
                 description = temp_meta["district"].pop("description")
             elif self.subdistricts_mapping or subdistrict:
                 if district == subdistrict:
@@ -193,11 +219,11 @@ class CreateMetaSections(BaseConfig):
                 and district.lower() == "municipal large"
                 and isinstance(dict_to_update.get("comment"), list)
             ):
-                dict_to_update = deepcopy(dict_to_update)
+                dict_to_update = dict(dict_to_update)
                 dict_to_update.pop("comment", None)
             temp_meta.update(dict_to_update)
 
-        district_metadata_update = deepcopy(district_metadata.get(district_key, {}))
+        district_metadata_update = dict(district_metadata.get(district_key, {}))
         metadata_fields_to_remove = []
         metadata_direct_updates = {}
         if district_metadata_update:
@@ -215,7 +241,7 @@ class CreateMetaSections(BaseConfig):
         district_comment = district_comments.get(district_key)
         if district_comment:
             temp_meta["comment"] = temp_meta.get("comment", []) + district_comment
-        num_projects, num_votes = utils.count_projects_and_votes(path_to_file)
+        num_projects, num_votes = counts
 
         if district_key in district_descriptions:
             description = district_descriptions[district_key]
@@ -251,20 +277,7 @@ class CreateMetaSections(BaseConfig):
             metadata.pop(field, None)
 
         # ADD fully_funded flag
-        all_projects = self.get_json_file("projects_data_per_district")
-        if district == "unit":
-            district = "CITYWIDE"
-        if self.subdistricts:
-            projects = all_projects[district][subdistrict]
-            # raise RuntimeError("NEEDS TO BE CHECKED WITH SUBDISTRICTS!!!")
-        else:
-            try:
-                projects = all_projects[district.upper()]
-            except KeyError:
-                try:
-                    projects = all_projects[district.title()]
-                except KeyError:
-                    projects = all_projects[district]
+        projects = self.get_file_projects(district, subdistrict)
         fully_funded = utils.check_if_fully_funded(budget, projects)
         if fully_funded:
             metadata["fully_funded"] = 1
@@ -3,6 +3,7 @@ from dataclasses import dataclass
 from pabulib.checker import flds
 
 import helpers.utilities as utils
+from process_data import pb_writer
 from process_data.base_config import BaseConfig
 
 
@@ -12,6 +13,8 @@ class CreateProjectsSections(BaseConfig):
     districts_fields: list = None
     districts_fields_overrides: dict = None
     output_file_name_mapping: dict = None
+    # number of processes creating sections of district files
+    processes: int = 1
 
     def __post_init__(self):
         self.output_file_name_mapping = self.output_file_name_mapping or {}
@@ -34,22 +37,19 @@ class CreateProjectsSections(BaseConfig):
                 projects_data_per_district, subdistricts=self.subdistricts
             )
 
-    def add_projects_section(self, csv_file, fields):
-        csv_file.writerow(["PROJECTS"])
-        csv_file.writerow(fields)
-
     def create_projects_sections(self):
         self.logger.info("Creating PROJECTS sections")
         if self.subdistricts:
             self.warn_on_missing_subdistrict_variants()
 
-        for district, projects in self.projects_data_per_district.items():
-            if self.subdistricts:
-                for subdistrict, projects in projects.items():
-                    self.unpack_district_projects(district, projects, subdistrict)
-
-            else:
-                self.unpack_district_projects(district, projects)
+        sections = pb_writer.map_in_order(
+            format_projects_section,
+            pb_writer.with_buffers(self.iterate_sections_jobs(), new=True),
+            self.processes,
+        )
+        for path_to_file, num_rows in sections:
+            pb_buffer = pb_writer.get_buffer(path_to_file)
+            pb_buffer.add_formatted_projects_section(num_rows)
 
         self.logger.info("PROJECTS sections created")
 
@@ -76,32 +76,43 @@ class CreateProjectsSections(BaseConfig):
                     f"missing={sorted(missing)}"
                 )
 
-    def unpack_district_projects(self, district, projects, subdistrict=None):
+    def iterate_sections_jobs(self):
+        """Yield `format_projects_section` arguments for every file."""
+        for district, projects in self.projects_data_per_district.items():
+            if self.subdistricts:
+                for subdistrict, projects in projects.items():
+                    yield *self.get_path_and_fields(district, subdistrict), projects
+
+            else:
+                yield *self.get_path_and_fields(district), projects
+
+    def get_path_and_fields(self, district, subdistrict=None):
         if district.upper() == "CITYWIDE":
-            file_, csv_file = utils.create_csv_file(self.unit_file_name)
             fields = self.unit_fields
         else:
-            district_upper = utils.change_district_into_name(district)
-            if self.subdistricts:
-                district_upper = utils.create_district_subdistrict_upper(
-                    district_upper, subdistrict
-                )
-            file_, csv_file = utils.create_csv_file(
-                self.unit_file_name, self.output_district_name(district_upper)
+            fields = self.districts_fields_overrides.get(
+                district, self.districts_fields
             )
-            fields = self.districts_fields_overrides.get(district, self.districts_fields)
 
         # sort to be consistent with order in fields.py file
         fields = [field for field in flds.PROJECTS_FIELDS_ORDER if field in fields]
+        return self.district_file_path(district, subdistrict), fields
 
-        self.add_projects_section(csv_file, fields)
 
-        for project_dict in projects:
-            row = []
-            for field in fields:
-                if field == "cost":
-                    cost = project_dict[field]
-                    project_dict[field] = utils.make_cost_printable(cost)
+def iterate_rows(projects, fields):
+    for project_dict in projects:
+        row = []
+        for field in fields:
+            if field == "cost":
+                row.append(utils.make_cost_printable(project_dict[field]))
+            else:
                 row.append(project_dict[field])
-            csv_file.writerow(row)
-        file_.close()
+        yield row
+
+
+def format_projects_section(path_to_file, fields, projects):
+    """Write PROJECTS section of the file, it can run in worker process."""
+    num_rows = pb_writer.format_section(
+        path_to_file, "PROJECTS", fields, iterate_rows(projects, fields)
+    )
+    return path_to_file, num_rows
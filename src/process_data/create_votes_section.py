@@ -1,10 +1,9 @@
-import csv
 from dataclasses import dataclass
 
-from natsort import natsorted
 from pabulib.checker import flds
 
 import helpers.utilities as utils
+from process_data import pb_writer
 from process_data.base_config import BaseConfig
 
 
@@ -14,6 +13,8 @@ class CreateVotesSections(BaseConfig):
     districts_fields: list = None
     subdistricts: bool = False
     output_file_name_mapping: dict = None
+    # number of processes creating sections of district files
+    processes: int = 1
 
     def __post_init__(self):
         self.output_file_name_mapping = self.output_file_name_mapping or {}
@@ -27,12 +28,20 @@ class CreateVotesSections(BaseConfig):
     def load_json_files(self):
         self.votes_data_per_district = self.get_json_file("votes_data_per_district")
 
-    def add_votes_section(self, csv_file, fields):
-        csv_file.writerow(["VOTES"])
-        csv_file.writerow(fields)
-
     def create_votes_sections(self):
         self.logger.info("Creating VOTES sections")
+        sections = pb_writer.map_in_order(
+            format_votes_section,
+            pb_writer.with_buffers(self.iterate_sections_jobs()),
+            self.processes,
+        )
+        for path_to_file, num_rows in sections:
+            pb_buffer = pb_writer.get_buffer(path_to_file)
+            pb_buffer.add_formatted_votes_section(num_rows)
+        self.logger.info("VOTES sections created")
+
+    def iterate_sections_jobs(self):
+        """Yield `format_votes_section` arguments for every file."""
         for district, votes in self.votes_data_per_district.items():
 
             if self.subdistricts:
@@ -40,39 +49,37 @@ class CreateVotesSections(BaseConfig):
                 # votes = sorted(votes, key=lambda d: d["voter_id"])
 
                 if isinstance(votes, list):
-                    self.unpack_district_votes(district, votes)
+                    yield *self.get_path_and_fields(district), votes, False
                 elif isinstance(votes, dict):
                     for subdistrict, votes in votes.items():
-                        self.unpack_district_votes(district, votes, subdistrict)
+                        path_and_fields = self.get_path_and_fields(
+                            district, subdistrict
+                        )
+                        yield *path_and_fields, votes, False
             else:
-                votes = natsorted(votes, key=lambda d: d["voter_id"])
-                self.unpack_district_votes(district, votes)
-        self.logger.info("VOTES sections created")
+                yield *self.get_path_and_fields(district), votes, True
 
-    def unpack_district_votes(self, district, votes, subdistrict=None):
+    def get_path_and_fields(self, district, subdistrict=None):
         if district.upper() == "CITYWIDE":
             fields = self.unit_fields
-            path_to_file = utils.get_path_to_file(self.unit_file_name)
         else:
-            district_upper = utils.change_district_into_name(district)
-            if self.subdistricts:
-                district_upper = utils.create_district_subdistrict_upper(
-                    district_upper, subdistrict
-                )
-            path_to_file = utils.get_path_to_file(
-                self.unit_file_name, self.output_district_name(district_upper)
-            )
             fields = self.districts_fields
 
         # sort to be consistent with order in fields.py file
         fields = [field for field in flds.VOTES_FIELDS_ORDER if field in fields]
+        return self.district_file_path(district, subdistrict), fields
+
+
+def iterate_rows(votes, fields):
+    for voter_dict in votes:
+        yield [voter_dict[field] for field in fields]
+
 
-        with open(path_to_file, "a+", newline="", encoding="utf-8") as file_:
-            csv_file = csv.writer(file_, delimiter=";")
-            self.add_votes_section(csv_file, fields)
-            for voter_dict in votes:
-                row = []
-                for field in fields:
-                    row.append(voter_dict[field])
-                csv_file.writerow(row)
-            file_.close()
+def format_votes_section(path_to_file, fields, votes, sort_votes):
+    """Write VOTES section of the file, it can run in worker process."""
+    if sort_votes:
+        votes = utils.natural_sorted(votes, key=lambda d: d["voter_id"])
+    num_rows = pb_writer.format_section(
+        path_to_file, "VOTES", fields, iterate_rows(votes, fields)
+    )
+    return path_to_file, num_rows
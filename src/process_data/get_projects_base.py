@@ -46,4 +46,6 @@ class GetProjects(BaseConfig):
             "projects_data_per_district": self.projects_data_per_district,
             "project_district_mapping": self.project_district_mapping,
         }
-        self.save_mappings_as_jsons(objects)
+        self.save_mappings_as_jsons(
+            objects, per_district=["projects_data_per_district"]
+        )
@@ -2,6 +2,7 @@ import collections
 from dataclasses import dataclass
 
 import helpers.utilities as utils
+from helpers import spreadsheets
 from helpers.mappings import beneficiaries_mapping, category_mapping
 from process_data.base_config import BaseConfig
 from process_data.models import ProjectItem
@@ -21,7 +22,7 @@ class GetProjects(BaseConfig):
         return super().__post_init__()
 
     def handle_columns_indexes(self):
-        self.col_names_indexes = utils.get_col_names_indexes(self.sheet)
+        self.col_names_indexes = self.sheet.col_names_indexes()
         # REQUIRED COLUMNS
         self.col = {
             "project_id": self.col_names_indexes[self.columns_mapping["project_id"]],
@@ -39,7 +40,7 @@ class GetProjects(BaseConfig):
         path_to_excel = utils.get_path_to_file_by_unit(
             self.excel_filename, self.unit, extra_dir=self.data_dir, ext=self.excel_ext
         )
-        self.sheet = utils.open_excel_workbook(path_to_excel)
+        self.sheet = spreadsheets.open_sheet(path_to_excel)
 
     def map_categories(self, category_pl):
         category_pl = category_pl.lower()
@@ -54,8 +55,7 @@ class GetProjects(BaseConfig):
         # If a city also has an anonymized ballots source, do not silently
         # recompute project-level votes/score from ballots unless that behavior
         # is explicitly enabled in a city-specific pipeline.
-        for col_idx in range(1, self.sheet.nrows):
-            row_values = self.sheet.row_values(col_idx)
+        for row_values in self.sheet.iter_rows(first_row=1):
             project_id = row_values[self.col["project_id"]]
             if isinstance(project_id, str):
                 project_id = project_id.strip()
@@ -206,8 +206,9 @@ class GetProjects(BaseConfig):
 
     def start(self):
         self.prepare_excel_sheet()
-        self.handle_columns_indexes()
-        self.iterate_through_projects()
+        with self.sheet:
+            self.handle_columns_indexes()
+            self.iterate_through_projects()
         self.create_district_upper_mapping()
         self.post_process()
         objects = {
@@ -218,4 +219,6 @@ class GetProjects(BaseConfig):
         }
         if self.subdistricts:
             objects["project_subdistrict_mapping"] = self.project_subdistrict_mapping
-        self.save_mappings_as_jsons(objects)
+        self.save_mappings_as_jsons(
+            objects, per_district=["projects_data_per_district"]
+        )
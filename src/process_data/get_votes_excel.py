@@ -1,15 +1,23 @@
 import collections
-import os
-from copy import deepcopy
+import hashlib
+import itertools
 from dataclasses import dataclass, field
 
-from natsort import natsorted
-
 import helpers.utilities as utils
+from helpers import spreadsheets
 from process_data.base_config import BaseConfig
 from process_data.models import VoterItem
 
 
+def row_digest(row_values):
+    """Fixed-size digest of row values (compared as strings)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for value in row_values:
+        digest.update(str(value).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.digest()
+
+
 @dataclass(kw_only=True)
 class GetVotesExcel(BaseConfig):
     excel_filename: str
@@ -24,6 +32,8 @@ class GetVotesExcel(BaseConfig):
     only_valid_votes: bool = False
     csv_settings: dict = field(default_factory=lambda: {})
     load_subdistricts_mapping: bool = False
+    # rows of every voter are already next to each other, skip sorting
+    input_sorted: bool = False
 
     def __post_init__(self):
         self.initialize_mapping_dicts()
@@ -60,37 +70,21 @@ class GetVotesExcel(BaseConfig):
             else:
                 self.no_points = False
 
-    def handle_csv(self, path_to_excel):
-        if self.excel_filename[-4:] == ".csv":
-            self.logger.info("Converting CSV into Excel file...")
-            delimiter = self.csv_settings.get("delimiter", ",")
-            encoding = self.csv_settings.get("encoding", "utf-8")
-            path, _, xlsx = path_to_excel.split(".")
-            path_to_csv = f"{path}.csv"
-            path_to_excel = f"{path}.{xlsx}"
-            if os.path.exists(path_to_excel):
-                self.logger.info(
-                    """There is already existing Excel file, converting
-                     stopped. If you want to convert anyway, 
-                     please remove xlsx."""
-                )
-            else:
-                utils.convert_csv_to_xl(
-                    path_to_csv, delimiter=delimiter, encoding=encoding
-                )
-                self.logger.info("Converting finished.")
-        return path_to_excel
-
     def open_excel_sheet(self):
+        excel_filename, ext = self.excel_filename, self.excel_ext
+        if excel_filename.endswith(".csv"):
+            # CSV is read directly, with `csv_settings` (delimiter, encoding)
+            excel_filename, ext = excel_filename[:-4], "csv"
         path_to_excel = utils.get_path_to_file_by_unit(
-            self.excel_filename, self.unit, extra_dir=self.data_dir, ext=self.excel_ext
+            excel_filename, self.unit, extra_dir=self.data_dir, ext=ext
+        )
+        self.sheet = spreadsheets.open_sheet(
+            path_to_excel, csv_settings=self.csv_settings
         )
-        path_to_excel = self.handle_csv(path_to_excel)
-        self.sheet = utils.open_excel_workbook(path_to_excel)
         self.handle_columns_indexes()
 
     def handle_columns_indexes(self):
-        col_names_indexes = utils.get_col_names_indexes(self.sheet)
+        col_names_indexes = self.sheet.col_names_indexes()
         # REQUIRED COLUMNS
         self.col = {"voter_id": col_names_indexes[self.columns_mapping["voter_id"]]}
         if self.columns_mapping.get("district"):
@@ -134,19 +128,33 @@ class GetVotesExcel(BaseConfig):
             self.vote_field = col_names_indexes[self.columns_mapping["vote_column"]]
 
     def sort_rows_by_voter_id(self):
-        data = [self.sheet.row_values(i) for i in range(self.sheet.nrows)]
-        data = data[self.first_row :]
-        self.data = natsorted(data, key=lambda x: x[self.col["voter_id"]])
+        # the same pass over the sheet checks for duplicated rows
+        data = self.scan_rows()
+        if self.input_sorted:
+            # rows are streamed from the sheet, duplicates are reported when
+            # the whole sheet was read (see `check_remaining_rows`)
+            self.data = data
+        else:
+            self.data = utils.natural_sorted(
+                data, key=lambda x: x[self.col["voter_id"]]
+            )
 
     def get_votes(self):
         self.open_excel_sheet()
-        self.check_if_no_duplicated_rows()
-        self.sort_rows_by_voter_id()
-        self.iterate_through_rows()
+        with self.sheet:
+            self.sort_rows_by_voter_id()
+            self.iterate_through_rows()
+            self.check_remaining_rows()
         objects = {
             "votes_data_per_district": self.votes_data_per_district,
         }
-        self.save_mappings_as_jsons(objects)
+        self.save_mappings_as_jsons(objects, per_district=["votes_data_per_district"])
+
+    def check_remaining_rows(self):
+        """Read the rest of a streamed sheet (iterating stops at the first row
+        without voter ID), so duplicated rows are reported before saving."""
+        if self.input_sorted:
+            collections.deque(self.data, maxlen=0)
 
     def check_if_vote_is_valid(self, row_data):
         if self.only_valid_votes:
@@ -154,16 +162,32 @@ class GetVotesExcel(BaseConfig):
         if row_data[self.col["if_valid"]] == self.valid_value:
             return True
 
-    def check_if_no_duplicated_rows(self):
-        all_rows = set()
-        for row in range(1, self.sheet.nrows):
-            row_values = self.sheet.row_values(row)
-            if any(row_values):
-                row_values = [str(value) for value in row_values]
-                row_txt = "\x1f".join(row_values)
-                if row_txt in all_rows:
-                    raise RuntimeError(f"There is a duplicated row! {row_values}")
-                all_rows.add(row_txt)
+    def scan_rows(self):
+        """Yield rows of votes (from `first_row`) in one pass over the sheet,
+        checking that there are no duplicated rows (headers excluded). Only
+        digests of rows are kept, RuntimeError with all groups of duplicated
+        rows is raised after the last row."""
+        first_rows = {}
+        duplicates = {}
+        start = min(1, self.first_row)
+        for row_idx, row_values in enumerate(self.sheet.iter_rows(start), start):
+            if row_idx >= 1 and any(row_values):
+                digest = row_digest(row_values)
+                first_row = first_rows.setdefault(digest, row_idx)
+                if first_row != row_idx:
+                    duplicates.setdefault(digest, [first_row]).append(row_idx)
+            if row_idx >= self.first_row:
+                yield row_values
+        if duplicates:
+            # row numbers as in spreadsheet (1-based)
+            groups = [
+                ", ".join(str(row_idx + 1) for row_idx in rows)
+                for rows in duplicates.values()
+            ]
+            raise RuntimeError(
+                f"There are duplicated rows! {len(groups)} groups, rows: "
+                + "; ".join(groups)
+            )
 
     def handle_poznan_district(self, district):
         if district == "Projekt ogólnomiejski w ramach Zielonego Budżetu":
@@ -195,7 +219,19 @@ class GetVotesExcel(BaseConfig):
         subdistrict = self.district_district_name_mapping["subdistricts"][subdistrict]
         return district, subdistrict
 
-    def handle_multiple_rows(self, idx, row, voter_id):
+    def handle_multiple_rows(self, voter_id, rows):
+        for row in rows:
+            neighborhood = self.add_row_to_voter_votes(row)
+        if self.handle_lublin_2020_malformed_citywide_vote(row, voter_id):
+            self.voter_votes = collections.defaultdict(list)
+            return
+        voter_item = self.create_voter_item(row, voter_id, neighborhood)
+        if self.no_points:
+            self.handle_multiple_rows_no_points(voter_item)
+        else:
+            self.handle_multiple_rows_with_points(voter_item)
+
+    def add_row_to_voter_votes(self, row):
         col_name = "subdistrict" if self.col.get("subdistrict") else "district"
 
         vote = row[self.vote_field]
@@ -243,28 +279,7 @@ class GetVotesExcel(BaseConfig):
             # TODO handle subdistricts
             points = int(row[self.points_field])
             self.voter_votes[district].append([vote, points])
-
-        try:
-            valid = False
-            counter = 0
-            while not valid:
-                counter += 1
-                next_row = self.data[idx + counter]
-                valid = self.check_if_vote_is_valid(next_row)
-            next_voter = self.data[idx + counter][self.col["voter_id"]]
-            if self.voter_id_integer:
-                next_voter = int(next_voter)
-        except IndexError:
-            next_voter = None
-        if str(voter_id) != str(next_voter):
-            if self.handle_lublin_2020_malformed_citywide_vote(row, voter_id):
-                self.voter_votes = collections.defaultdict(list)
-                return
-            voter_item = self.create_voter_item(row, voter_id, neighborhood)
-            if self.no_points:
-                self.handle_multiple_rows_no_points(voter_item)
-            else:
-                self.handle_multiple_rows_with_points(voter_item)
+        return neighborhood
 
     def handle_lublin_2020_malformed_citywide_vote(self, row, voter_id):
         if self.unit != "Lublin" or self.instance != 2020:
@@ -276,14 +291,13 @@ class GetVotesExcel(BaseConfig):
                 "into two citywide votes with two projects each."
             )
             voter_item = self.create_voter_item(row, voter_id)
-            first_vote = deepcopy(voter_item)
-            first_vote.vote = ",".join(citywide_votes[:2])
-            self.votes_data_per_district["CITYWIDE"].append(vars(first_vote))
-
-            second_vote = deepcopy(voter_item)
-            second_vote.voter_id = int(f"9999{voter_id}")
-            second_vote.vote = ",".join(citywide_votes[2:])
-            self.votes_data_per_district["CITYWIDE"].append(vars(second_vote))
+            first_vote = voter_item.clone(vote=",".join(citywide_votes[:2]))
+            self.votes_data_per_district["CITYWIDE"].append(first_vote)
+
+            second_vote = voter_item.clone(
+                voter_id=int(f"9999{voter_id}"), vote=",".join(citywide_votes[2:])
+            )
+            self.votes_data_per_district["CITYWIDE"].append(second_vote)
             return True
         return False
 
@@ -304,12 +318,12 @@ class GetVotesExcel(BaseConfig):
         for district, votes in self.voter_votes.items():
             district_upper = utils.change_district_into_name(district)
             sorted_votes = sorted(votes, key=lambda x: x[1], reverse=True)
-            voter_item_cp = deepcopy(voter_item)
             votes = [el[0] for el in sorted_votes]
             points = [str(el[1]) for el in sorted_votes]
-            voter_item_cp.vote = ",".join(votes)
-            voter_item_cp.points = ",".join(points)
-            self.votes_data_per_district[district_upper].append(vars(voter_item_cp))
+            voter_item_cp = voter_item.clone(
+                vote=",".join(votes), points=",".join(points)
+            )
+            self.votes_data_per_district[district_upper].append(voter_item_cp)
         self.voter_votes = collections.defaultdict(list)
 
     def handle_multiple_rows_no_points(self, voter_item):
@@ -322,24 +336,55 @@ class GetVotesExcel(BaseConfig):
                         subdistrict = "CITYWIDE"
                     district_upper = utils.change_district_into_name(district)
                     subdistrict_upper = utils.change_district_into_name(subdistrict)
-                    voter_item_cp = deepcopy(voter_item)
-                    voter_item_cp.vote = ",".join(votes)
+                    voter_item_cp = voter_item.clone(vote=",".join(votes))
                     if not self.votes_data_per_district.get(district_upper):
                         self.votes_data_per_district[district_upper] = (
                             collections.defaultdict(list)
                         )
                     self.votes_data_per_district[district_upper][
                         subdistrict_upper
-                    ].append(vars(voter_item_cp))
+                    ].append(voter_item_cp)
         else:
             for district, votes in self.voter_votes.items():
                 district_upper = utils.change_district_into_name(district)
-                voter_item_cp = deepcopy(voter_item)
-                voter_item_cp.vote = ",".join(votes)
-                self.votes_data_per_district[district_upper].append(vars(voter_item_cp))
+                voter_item_cp = voter_item.clone(vote=",".join(votes))
+                self.votes_data_per_district[district_upper].append(voter_item_cp)
         self.voter_votes = collections.defaultdict(list)
 
+    def iterate_valid_rows(self):
+        """Yield `(voter_id, row)` for valid rows, stop at the first row
+        without voter ID."""
+        for row in self.data:
+            if not self.check_if_vote_is_valid(row):
+                continue
+            voter_id = row[self.col["voter_id"]]
+            if self.voter_id_integer:
+                voter_id = int(voter_id)
+            if not voter_id:
+                return
+            yield voter_id, row
+
+    def iterate_voters_rows(self):
+        """Group valid rows by voter in a single pass, yields
+        `(voter_id, rows)`. Rows of a voter have to be next to each other."""
+        seen_voters = set()
+        groups = itertools.groupby(self.iterate_valid_rows(), key=lambda x: str(x[0]))
+        for voter_key, group in groups:
+            if self.input_sorted:
+                if voter_key in seen_voters:
+                    raise RuntimeError(
+                        f"Rows of voter `{voter_key}` are not next to each other, "
+                        "input is not sorted by voter ID!"
+                    )
+                seen_voters.add(voter_key)
+            group = list(group)
+            yield group[0][0], [row for _, row in group]
+
     def iterate_through_rows(self):
+        if self.handler == self.handle_multiple_rows:
+            for voter_id, rows in self.iterate_voters_rows():
+                self.handler(voter_id, rows)
+            return
         for idx, row_data in enumerate(self.data):
             valid = self.check_if_vote_is_valid(row_data)
             if valid:
@@ -418,15 +463,15 @@ class GetVotesExcel(BaseConfig):
                     f"districts_split: {districts_split} "
                 )
                 for district, vote in districts_split.items():
-                    new_voter_item = deepcopy(voter_item_cp)
-                    new_voter_item.voter_id = int(f"999999{new_voter_item.voter_id}")
-                    vote = ",".join(vote)
-                    new_voter_item.vote = self.clean_votes_field(vote)
-                    self.votes_data_per_district[district].append(vars(new_voter_item))
+                    new_voter_item = voter_item_cp.clone(
+                        voter_id=int(f"999999{voter_item_cp.voter_id}"),
+                        vote=self.clean_votes_field(",".join(vote)),
+                    )
+                    self.votes_data_per_district[district].append(new_voter_item)
             else:
                 # VALID VOTE
                 district = next(iter(districts))
-                self.votes_data_per_district[district].append(vars(voter_item_cp))
+                self.votes_data_per_district[district].append(voter_item_cp)
 
     def create_voter_item(self, row, voter_id, neighborhood=None):
         item = VoterItem(voter_id)
@@ -454,10 +499,10 @@ class GetVotesExcel(BaseConfig):
         to the voter_id, to be consistent with city results and
         to avoid having incorrect (i.e., too long) votes.
         """
-        voter_item_cp = deepcopy(voter_item)
-        voter_item_cp.voter_id = int(f"99999{voter_item.voter_id}")
-        voter_item_cp.vote = 285
-        self.votes_data_per_district["local"].append(vars(voter_item_cp))
+        voter_item_cp = voter_item.clone(
+            voter_id=int(f"99999{voter_item.voter_id}"), vote=285
+        )
+        self.votes_data_per_district["local"].append(voter_item_cp)
 
     def handle_one_row_no_points(self, _, row, voter_id):
 
@@ -473,7 +518,7 @@ class GetVotesExcel(BaseConfig):
                 self.hanlde_project_285_bug_wroclaw_2023(voter_item)
             else:
                 voter_item.vote = self.clean_votes_field(unit_votes)
-                self.votes_data_per_district["CITYWIDE"].append(vars(voter_item))
+                self.votes_data_per_district["CITYWIDE"].append(voter_item)
 
         for subdistrict, column_index in self.district_columns.items():
 
@@ -505,8 +550,9 @@ class GetVotesExcel(BaseConfig):
             #         f"{neighborhood}, {subdistrict}, {subdistrict_level}, {voter_item.neighborhood}"
             #     )
             if district_votes and district_votes not in utils.wrong_votes:
-                voter_item_cp = deepcopy(voter_item)
-                voter_item_cp.vote = self.clean_votes_field(district_votes)
+                voter_item_cp = voter_item.clone(
+                    vote=self.clean_votes_field(district_votes)
+                )
                 if self.subdistricts:
                     if not self.votes_data_per_district.get(neighborhood):
                         self.votes_data_per_district[neighborhood] = (
@@ -514,16 +560,14 @@ class GetVotesExcel(BaseConfig):
                         )
 
                     self.votes_data_per_district[neighborhood][subdistrict].append(
-                        vars(voter_item_cp)
+                        voter_item_cp
                     )
                 else:
                     if self.unit == "Warszawa" and self.instance == 2024:
                         # Warszawa 2024 bug
                         self.handle_warszawa_2024_votes(row, voter_id, voter_item_cp)
                     else:
-                        self.votes_data_per_district[neighborhood].append(
-                            vars(voter_item_cp)
-                        )
+                        self.votes_data_per_district[neighborhood].append(voter_item_cp)
 
     def handle_no_points_separate_votes(self, _, row, voter_id):
         voter_item = self.create_voter_item(row, voter_id)
@@ -540,10 +584,9 @@ class GetVotesExcel(BaseConfig):
             else:
                 # get district from mapping JSON
                 district = self.project_district_mapping[project_id]
-            voter_item_cp = deepcopy(voter_item)
             # it works only if vote only for one project_id per (sub)district
             # if not, combine votes per (sub)district is needed
-            voter_item_cp.vote = project_id
+            voter_item_cp = voter_item.clone(vote=project_id)
             if self.subdistricts:
                 if self.col.get("subdistrict"):
                     subdistrict = row[self.col["subdistrict"]]
@@ -554,7 +597,7 @@ class GetVotesExcel(BaseConfig):
                         list
                     )
                 self.votes_data_per_district[district][subdistrict].append(
-                    vars(voter_item_cp)
+                    voter_item_cp
                 )
             else:
-                self.votes_data_per_district[district].append(vars(voter_item_cp))
+                self.votes_data_per_district[district].append(voter_item_cp)
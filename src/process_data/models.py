@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from typing import Union
 
 import helpers.mappings as mapps
@@ -91,7 +91,7 @@ class ProjectItem:
             self.subdistrict = subdistrict
 
 
-@dataclass
+@dataclass(slots=True)
 class VoterItem:
     voter_id: Union[int, str]
     age: int = None
@@ -100,6 +100,18 @@ class VoterItem:
     vote: str = None
     points: str = None
     neighborhood: str = None
+    district: str = None
+
+    def clone(self, **changes):
+        """Shallow copy, fields are plain values so it is enough."""
+        return replace(self, **changes)
+
+    def __getitem__(self, key):
+        # the same access as to dicts loaded from votes JSON file
+        return getattr(self, key)
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
 
     def add_vote(self, vote):
         self.vote = vote
@@ -0,0 +1,140 @@
+"""Buffered writer of .pb files created in `run_it`.
+
+PROJECTS and VOTES sections are written row by row to a temporary
+`<file>.sections.tmp` file until META section is created, then META and the
+sections are written to the .pb file (sections are not kept in memory).
+Number of projects and votes needed in META is counted while sections are
+added, so the file does not need to be read again.
+
+Example of usage:
+
+    pb_writer.new_buffer(path_to_file)
+    num_rows = pb_writer.format_section(path_to_file, "PROJECTS", fields, rows)
+    pb_writer.get_buffer(path_to_file).add_formatted_projects_section(num_rows)
+    ... VOTES section is added the same way ...
+    pb_writer.pop_buffer(path_to_file).save(meta_txt)
+
+Sections can be written in worker processes with `format_section` and
+`map_in_order` (every job writes a different file), buffers have to be
+created before jobs run, see `with_buffers`.
+"""
+
+import collections
+import csv
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+SECTIONS_FILE_SUFFIX = ".sections.tmp"
+
+_buffers = {}
+
+
+class _SectionFile:
+    """File-like object for csv.writer, rows are written with "\n" line
+    endings and newlines at the end of the last row are dropped (no empty
+    line at the end of file)."""
+
+    def __init__(self, file_):
+        self.file_ = file_
+        self.trailing_newlines = ""
+
+    def write(self, text):
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+        stripped = text.rstrip("\n")
+        self.file_.write(self.trailing_newlines)
+        self.file_.write(stripped)
+        self.trailing_newlines = text[len(stripped) :]
+
+
+def format_section(path, name, fields, rows):
+    """Append section (name, fields and rows) to the sections file of `path`,
+    return number of rows. It can run in worker process."""
+    with open(f"{path}{SECTIONS_FILE_SUFFIX}", "a", encoding="utf-8") as file_:
+        if file_.tell():
+            # newline after previous section
+            file_.write("\n")
+        writer = csv.writer(_SectionFile(file_), delimiter=";")
+        writer.writerow([name])
+        writer.writerow(fields)
+        num_rows = 0
+        for row in rows:
+            writer.writerow(row)
+            num_rows += 1
+    return num_rows
+
+
+def map_in_order(func, jobs, processes=1):
+    """Yield `func(*job)` for every job, in order of jobs. With `processes`
+    > 1 jobs run in worker processes, at most 2 * processes at a time (jobs
+    are not all taken from iterator at once)."""
+    if processes <= 1:
+        for job in jobs:
+            yield func(*job)
+        return
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = collections.deque()
+        for job in jobs:
+            pending.append(executor.submit(func, *job))
+            if len(pending) >= 2 * processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class PBFileBuffer:
+    def __init__(self, path):
+        self.path = path
+        self.sections_path = f"{path}{SECTIONS_FILE_SUFFIX}"
+        self.num_projects = 0
+        self.num_votes = 0
+        open(self.sections_path, "w", encoding="utf-8").close()
+
+    def add_formatted_projects_section(self, num_rows):
+        """Count section written by `format_section` (e.g. in worker process)."""
+        self.num_projects += num_rows
+
+    def add_formatted_votes_section(self, num_rows):
+        self.num_votes += num_rows
+
+    def save(self, meta_txt=""):
+        with open(self.path, "w", encoding="utf-8") as file_:
+            file_.write(meta_txt)
+            with open(self.sections_path, encoding="utf-8") as sections:
+                shutil.copyfileobj(sections, file_)
+        os.remove(self.sections_path)
+
+
+def new_buffer(path):
+    """Start a new file, previous content of the file is dropped."""
+    _buffers[path] = PBFileBuffer(path)
+    return _buffers[path]
+
+
+def get_buffer(path):
+    if path not in _buffers:
+        return new_buffer(path)
+    return _buffers[path]
+
+
+def with_buffers(jobs, new=False):
+    """Yield jobs (path of file first), buffer of every file is created (or
+    started again with `new`) before its job runs."""
+    for job in jobs:
+        if new:
+            new_buffer(job[0])
+        else:
+            get_buffer(job[0])
+        yield job
+
+
+def pop_buffer(path):
+    """Return buffer of given file (None if there is no such buffer)."""
+    return _buffers.pop(path, None)
+
+
+def save_remaining_buffers():
+    """Save files which did not get META section."""
+    while _buffers:
+        _, pb_buffer = _buffers.popitem()
+        pb_buffer.save()
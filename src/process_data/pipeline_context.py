@@ -0,0 +1,47 @@
+from dataclasses import dataclass, field
+
+
+def _json_key(key):
+    if isinstance(key, str):
+        return key
+    if isinstance(key, bool):
+        return "true" if key else "false"
+    if key is None:
+        return "null"
+    return str(key)
+
+
+def as_loaded_from_json(obj):
+    """Return object as it would be loaded back from JSON file: with string
+    keys and plain dicts / lists. Records (e.g. VoterItem) are kept."""
+    if isinstance(obj, dict):
+        return {
+            _json_key(key): as_loaded_from_json(value) for key, value in obj.items()
+        }
+    if isinstance(obj, (list, tuple)):
+        return [as_loaded_from_json(value) for value in obj]
+    return obj
+
+
+@dataclass
+class PipelineContext:
+    """Objects passed in memory between stages of `run_it`, instead of
+    saving them to output/jsons and loading them again in every stage.
+
+    With `save_jsons` objects are also saved as JSON files (checkpoint for
+    debugging or for scripts which read them later)."""
+
+    save_jsons: bool = True
+    objects: dict = field(default_factory=dict)
+    # district_upper -> path to .pb file, shared by stages creating the files
+    district_file_paths: dict = field(default_factory=dict)
+
+    def __contains__(self, name):
+        return name in self.objects
+
+    def __getitem__(self, name):
+        return self.objects[name]
+
+    def update(self, objects):
+        for name, obj in objects.items():
+            self.objects[name] = as_loaded_from_json(obj)
@@ -1,14 +1,27 @@
+import glob
+
 import helpers.utilities as utils
 from process_data.create_meta_section import CreateMetaSections
 from process_data.create_projects_section import CreateProjectsSections
 from process_data.create_votes_section import CreateVotesSections
 from process_data.get_projects_excel import GetProjects
 from process_data.get_votes_excel import GetVotesExcel
+from process_data.pipeline_context import PipelineContext
+from process_data.stage_fingerprints import StageFingerprints
 
 unusual_units = ["mechanical_turk", "stanford"]
 
 
-def run_it(year, unit):
+def run_it(year, unit, save_jsons=True, incremental=False, processes=1):
+    """Run all stages for given unit and year. Stages pass data in memory,
+    set `save_jsons` to False to skip saving it also to output/jsons.
+
+    With `incremental`, stages whose inputs (source files, settings and code)
+    did not change since the last run are skipped and their outputs saved
+    in output/jsons are reused (see `stage_fingerprints`).
+
+    With `processes` > 1, PROJECTS and VOTES sections of district files are
+    created in worker processes (files are the same as with one process)."""
 
     unit_package = utils.remove_accents_from_str(unit)
     packages = f"process_data.cities.{unit_package.lower()}"
@@ -19,6 +32,12 @@ def run_it(year, unit):
 
     data = all_data[year]
 
+    context = PipelineContext(save_jsons=save_jsons)
+    # stages can be skipped only if their outputs are saved
+    fingerprints = StageFingerprints(
+        **data["base_data"], enabled=incremental and save_jsons
+    )
+
     preprocessing = data.get("preprocess")
 
     if preprocessing:
@@ -28,15 +47,24 @@ def run_it(year, unit):
         pp = Preprocess(
             **data["base_data"],
             **{"preprocess": data.get("preprocess")},
+            context=context,
+        )
+        fingerprints.run(
+            "preprocess",
+            {"base_data": data["base_data"], "preprocess": preprocessing},
+            pp.start,
+            context,
+            get_outputs=lambda: pp.output_files,
         )
-        pp.start()
 
     if unit in unusual_units:
         ProcessData = getattr(
             __import__(f"{packages}.process_data", fromlist=["ProcessData"]),
             "ProcessData",
         )
-        pd = ProcessData(**data["base_data"], **{"metadata": data["metadata"]})
+        pd = ProcessData(
+            **data["base_data"], **{"metadata": data["metadata"]}, context=context
+        )
         pd.start()
         return
 
@@ -55,29 +83,93 @@ def run_it(year, unit):
         )
     except ModuleNotFoundError:
         gp = GetProjects
-    sp = gp(**data["base_data"], **data["get_projects"])
-    sp.start()
+    sp = gp(**data["base_data"], **data["get_projects"], context=context)
+
+    # fixes of PB files written by the generic stages (e.g. Poznań, Gdynia),
+    # called with country, unit, instance and context (objects of the stages)
+    try:
+        postprocess = getattr(
+            __import__(f"{packages}.postprocess", fromlist=["postprocess"]),
+            f"run_{unit_package.lower()}_postprocess",
+        )
+    except ModuleNotFoundError as exc:
+        # only a missing postprocess module, not its missing dependency
+        if exc.name != f"{packages}.postprocess":
+            raise
+        postprocess = None
+
+    fingerprints.run(
+        "get_projects",
+        {"base_data": data["base_data"], "get_projects": data["get_projects"]},
+        sp.start,
+        context,
+    )
 
     # GET VOTES FROM EXCEL FILE
     # logger.info('Getting votes from excel file...')
-    gv = GetVotesExcel(**data["base_data"], **data["get_votes"])
-    gv.get_votes()
-
-    # CREATE PB FILES AND SAVE PROJECTS SECTIONS
-    logger.info("Creating PB files and save with PROJECTS sections")
-    cps = CreateProjectsSections(**data["base_data"], **data["projects_data"])
-    cps.create_projects_sections()
-
-    # ADD VOTES SECTIONS TO PB FILES
-    logger.info("Adding VOTES sections...")
-    cvs = CreateVotesSections(**data["base_data"], **data["votes_data"])
-    cvs.create_votes_sections()
-
-    # # ADD META SECTIONS TO PB FILES
-    logger.info("Adding METADATA sections...")
-    cms = CreateMetaSections(
-        **data["base_data"],
-        **{"budgets": budgets[year]},
-        **{"metadata": data["metadata"]},
+    def get_votes():
+        gv = GetVotesExcel(**data["base_data"], **data["get_votes"], context=context)
+        gv.get_votes()
+
+    fingerprints.run(
+        "get_votes",
+        {"base_data": data["base_data"], "get_votes": data["get_votes"]},
+        get_votes,
+        context,
+    )
+
+    def create_pb_files():
+        # CREATE PB FILES AND SAVE PROJECTS SECTIONS
+        logger.info("Creating PB files and save with PROJECTS sections")
+        cps = CreateProjectsSections(
+            **data["base_data"],
+            **data["projects_data"],
+            context=context,
+            processes=processes,
+        )
+        cps.create_projects_sections()
+
+        # ADD VOTES SECTIONS TO PB FILES
+        logger.info("Adding VOTES sections...")
+        cvs = CreateVotesSections(
+            **data["base_data"],
+            **data["votes_data"],
+            context=context,
+            processes=processes,
+        )
+        cvs.create_votes_sections()
+
+        # # ADD META SECTIONS TO PB FILES
+        logger.info("Adding METADATA sections...")
+        cms = CreateMetaSections(
+            **data["base_data"],
+            **{"budgets": budgets[year]},
+            **{"metadata": data["metadata"]},
+            context=context,
+        )
+        cms.add_metadata()
+
+        # run before outputs of the stage are recorded
+        if postprocess:
+            logger.info("Running postprocess...")
+            postprocess(
+                country=data["base_data"]["country"],
+                unit=data["base_data"]["unit"],
+                instance=int(data["base_data"]["instance"]),
+                context=context,
+            )
+
+    unit_file_name = "{country}_{unit}_{instance}_".format(**data["base_data"])
+    fingerprints.run(
+        "pb_files",
+        {
+            "base_data": data["base_data"],
+            "projects_data": data["projects_data"],
+            "votes_data": data["votes_data"],
+            "metadata": data["metadata"],
+            "budgets": budgets[year],
+        },
+        create_pb_files,
+        context,
+        get_outputs=lambda: glob.glob(utils.get_path_to_file(unit_file_name, "*")),
     )
-    cms.add_metadata()
@@ -0,0 +1,205 @@
+"""Fingerprints of `run_it` stages, used to skip stages whose inputs did not
+change since the last run. Outputs of a skipped stage are not created again,
+next stages load them from checkpoints in output/jsons.
+
+Fingerprint of a stage is a hash of:
+    - content of source files in `data/<unit>/<data_dir>` of the stage,
+    - its sub-dicts of `settings.all_data[year]` (and budgets),
+    - code version (content of process_data, helpers and the city modules,
+      except settings.py and budgets.py),
+    - fingerprint of the previous stage, so a change is passed down.
+
+Hashes of files are cached in the manifest by size and mtime, so unchanged
+spreadsheets are not read again. Fingerprints are saved in
+`output/jsons/<country>_<unit>_<year>_stages_fingerprints.json`.
+"""
+
+import glob
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+
+import helpers.settings as settings
+import helpers.utilities as utils
+from helpers import checkpoints
+
+MANIFEST_NAME = "stages_fingerprints"
+CHUNK_SIZE = 1024 * 1024
+CITY_CONFIG_FILES = ("settings.py", "budgets.py")
+
+
+def _hash_settings(stage_settings):
+    text = json.dumps(stage_settings, sort_keys=True, ensure_ascii=False, default=repr)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _list_files(path):
+    if os.path.isfile(path):
+        return [path]
+    files = []
+    for root, dirs, names in os.walk(path):
+        # hidden dirs and files (e.g. caches) are not inputs
+        dirs[:] = sorted(name for name in dirs if not name.startswith("."))
+        files.extend(
+            os.path.join(root, name)
+            for name in sorted(names)
+            if not name.startswith(".")
+        )
+    return files
+
+
+@dataclass(kw_only=True)
+class StageFingerprints:
+    country: str
+    unit: str
+    instance: int
+    # if False, all stages are run and nothing is recorded
+    enabled: bool = True
+
+    def __post_init__(self):
+        self.logger = utils.create_logger()
+        self.unit_package = utils.remove_accents_from_str(self.unit).lower()
+        self.manifest_path = utils.create_json_filepath(
+            self.country, self.unit, self.instance, MANIFEST_NAME
+        )
+        self.manifest = self.load_manifest()
+        self.previous = ""
+        self.code_version = None
+
+    def load_manifest(self):
+        if not self.enabled:
+            return {"stages": {}, "files": {}}
+        try:
+            return utils.load_json_obj(self.manifest_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"stages": {}, "files": {}}
+
+    def save_manifest(self):
+        utils.save_dict_as_json(self.manifest, self.manifest_path)
+
+    def hash_file(self, path):
+        stat = os.stat(path)
+        cached = self.manifest["files"].get(path)
+        if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return cached[2]
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as file_:
+            for chunk in iter(lambda: file_.read(CHUNK_SIZE), b""):
+                sha256.update(chunk)
+        self.manifest["files"][path] = [
+            stat.st_size,
+            stat.st_mtime_ns,
+            sha256.hexdigest(),
+        ]
+        return sha256.hexdigest()
+
+    def hash_files(self, paths):
+        sha256 = hashlib.sha256()
+        for path in paths:
+            relpath = os.path.relpath(path, settings.pabulib_dir)
+            sha256.update(f"{relpath}:{self.hash_file(path)}\n".encode("utf-8"))
+        return sha256.hexdigest()
+
+    def get_code_version(self):
+        if self.code_version is None:
+            patterns = (
+                "process_data/*.py",
+                "helpers/*.py",
+                f"process_data/cities/{self.unit_package}/*.py",
+            )
+            paths = []
+            for pattern in patterns:
+                paths.extend(
+                    sorted(glob.glob(os.path.join(settings.pabulib_dir, pattern)))
+                )
+            # city settings and budgets are hashed per stage (only used parts)
+            paths = [
+                path
+                for path in paths
+                if os.path.basename(path) not in CITY_CONFIG_FILES
+            ]
+            self.code_version = self.hash_files(paths)
+        return self.code_version
+
+    def get_source_files(self, data_dirs):
+        paths = []
+        for data_dir in data_dirs:
+            path = settings.get_path_to_excel_files(self.unit, extra_dir=str(data_dir))
+            paths.extend(_list_files(path))
+        return paths
+
+    def fingerprint(self, settings_hash, data_dirs):
+        sha256 = hashlib.sha256()
+        for part in (
+            self.previous,
+            self.get_code_version(),
+            settings_hash,
+            self.hash_files(self.get_source_files(data_dirs)),
+        ):
+            sha256.update(part.encode("utf-8"))
+        return sha256.hexdigest()
+
+    def is_up_to_date(self, stage, fingerprint):
+        recorded = self.manifest["stages"].get(stage)
+        if not recorded or recorded["fingerprint"] != fingerprint:
+            return False
+        # nothing to reuse, e.g. outputs of the stage were not declared
+        if not recorded["outputs"]:
+            return False
+        return all(os.path.exists(path) for path in recorded["outputs"])
+
+    def record(self, stage, fingerprint, outputs):
+        self.manifest["stages"][stage] = {
+            "fingerprint": fingerprint,
+            "outputs": outputs,
+        }
+        self.save_manifest()
+
+    def get_json_outputs(self, names):
+        outputs = []
+        for name in names:
+            filepath = utils.create_json_filepath(
+                self.country, self.unit, self.instance, name
+            )
+            checkpoint_dir = checkpoints.get_checkpoint_dir(filepath)
+            outputs.append(
+                checkpoint_dir if os.path.isdir(checkpoint_dir) else filepath
+            )
+        return outputs
+
+    def run(self, stage, stage_settings, func, context, get_outputs=None):
+        """Run stage unless its inputs did not change since the last run.
+
+        `stage_settings` are sub-dicts of `all_data[year]` used by the stage
+        (source files are taken from their `data_dir`). Outputs are JSON
+        objects saved by the stage and paths returned by `get_outputs` (files
+        written by the stage itself).
+        Returns True if the stage was run."""
+        # stages can modify their settings, so they are hashed before the run
+        settings_hash = _hash_settings(stage_settings)
+        data_dirs = [
+            value["data_dir"]
+            for value in stage_settings.values()
+            if isinstance(value, dict) and "data_dir" in value
+        ]
+        if self.enabled:
+            fingerprint = self.fingerprint(settings_hash, data_dirs)
+            if self.is_up_to_date(stage, fingerprint):
+                self.logger.info(f"{stage}: inputs not changed, stage skipped.")
+                self.previous = fingerprint
+                return False
+        names_before = set(context.objects)
+        func()
+        if not self.enabled:
+            return True
+        outputs = self.get_json_outputs(
+            name for name in context.objects if name not in names_before
+        )
+        if get_outputs:
+            outputs.extend(get_outputs())
+        # computed again, stage (e.g. preprocess) could change its source files
+        fingerprint = self.fingerprint(settings_hash, data_dirs)
+        self.record(stage, fingerprint, outputs)
+        self.previous = fingerprint
+        return True
@@ -0,0 +1,195 @@
+"""Run the process (`run_it`) for many cities and years in parallel.
+
+Jobs are (unit, year) pairs, given explicitly or taken from `all_data` of
+cities settings. Every job runs in its own worker process (so settings and
+module state are not shared), logs into `output/logs/<unit>_<year>.log`
+and a summary table is printed at the end.
+
+Example of usage (from the repository root):
+
+    python src/run_batch.py -j Gdynia:2025 -j Warszawa:2024 -p 2
+    python src/run_batch.py --unit Gdynia --unit Lublin -p 4
+    python src/run_batch.py --all -p 8 --incremental
+"""
+
+import glob
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import click
+
+import helpers.settings as settings
+import helpers.utilities as utils
+from process_data.run_it import run_it, unusual_units
+
+CITIES_PACKAGE = "process_data.cities"
+# not real cities, run only if asked explicitly
+EXCLUDED_FROM_ALL = ["a_city_template"]
+
+
+@dataclass
+class JobResult:
+    unit: str
+    year: int
+    status: str
+    duration: float
+    pb_files: int = 0
+    log_file: str = ""
+    error: str = ""
+
+
+def _import_all_data(unit):
+    unit_package = utils.remove_accents_from_str(unit).lower()
+    return getattr(
+        __import__(f"{CITIES_PACKAGE}.{unit_package}.settings", fromlist=["all_data"]),
+        "all_data",
+    )
+
+
+def get_unit_name(package):
+    """Name of unit, as passed to `run_it`, for city package."""
+    if package in unusual_units:
+        return package
+    all_data = _import_all_data(package)
+    for data in all_data.values():
+        unit = data["base_data"]["unit"]
+        if utils.remove_accents_from_str(unit).lower() == package:
+            return unit
+    return package
+
+
+def get_configured_jobs(units=None):
+    """Return (unit, year) pairs configured in `all_data` of given units
+    (all cities if None)."""
+    if units is None:
+        cities_dir = os.path.join(settings.pabulib_dir, *CITIES_PACKAGE.split("."))
+        packages = sorted(
+            os.path.basename(os.path.dirname(path))
+            for path in glob.glob(os.path.join(cities_dir, "*", "settings.py"))
+        )
+        units = [
+            get_unit_name(package)
+            for package in packages
+            if package not in EXCLUDED_FROM_ALL
+        ]
+    jobs = []
+    for unit in units:
+        for year in _import_all_data(unit):
+            jobs.append((unit, year))
+    return jobs
+
+
+def count_pb_files(unit, year):
+    base_data = _import_all_data(unit)[year]["base_data"]
+    unit_file_name = "{country}_{unit}_{instance}_".format(**base_data)
+    return len(glob.glob(utils.get_path_to_file(unit_file_name, "*")))
+
+
+def run_job(unit, year, run_it_kwargs):
+    logs_dir = os.path.join(settings.output_path, "logs")
+    os.makedirs(logs_dir, exist_ok=True)
+    unit_package = utils.remove_accents_from_str(unit).lower()
+    settings.log_file = os.path.join(logs_dir, f"{unit_package}_{year}.log")
+    if os.path.exists(settings.log_file):
+        os.remove(settings.log_file)
+    start = time.perf_counter()
+    try:
+        # city postprocess (e.g. Gdynia splitting the citywide file) runs
+        # inside run_it, so files are final when they are counted below and
+        # its errors fail the job
+        run_it(year, unit, **run_it_kwargs)
+    except Exception as exc:
+        utils.create_logger().error(traceback.format_exc())
+        return JobResult(
+            unit,
+            year,
+            status="failed",
+            duration=time.perf_counter() - start,
+            log_file=settings.log_file,
+            error=f"{type(exc).__name__}: {exc}",
+        )
+    return JobResult(
+        unit,
+        year,
+        status="ok",
+        duration=time.perf_counter() - start,
+        pb_files=count_pb_files(unit, year),
+        log_file=settings.log_file,
+    )
+
+
+def run_batch(jobs, processes=1, **run_it_kwargs):
+    """Run jobs on a process pool, `run_it_kwargs` are passed to `run_it`.
+    Results are returned in order of jobs."""
+    # a fresh process for every job, cities settings are modified by run_it
+    with ProcessPoolExecutor(max_workers=processes, max_tasks_per_child=1) as executor:
+        futures = [
+            executor.submit(run_job, unit, year, run_it_kwargs) for unit, year in jobs
+        ]
+        return [future.result() for future in futures]
+
+
+def format_summary(results):
+    headers = ["unit", "year", "status", "time [s]", ".pb files", "error"]
+    rows = [
+        [
+            result.unit,
+            str(result.year),
+            result.status,
+            f"{result.duration:.1f}",
+            str(result.pb_files),
+            result.error,
+        ]
+        for result in results
+    ]
+    widths = [
+        max(len(row[idx]) for row in [headers, *rows]) for idx in range(len(headers))
+    ]
+    lines = [
+        " | ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+        for row in [headers, ["-" * width for width in widths], *rows]
+    ]
+    failed = sum(result.status != "ok" for result in results)
+    lines.append(f"\n{len(results) - failed} ok, {failed} failed")
+    return "\n".join(lines)
+
+
+def parse_job(job):
+    unit, _, year = job.rpartition(":")
+    if not unit or not year.isdigit():
+        raise click.BadParameter(f"expected UNIT:YEAR, got {job!r}")
+    return unit, int(year)
+
+
+@click.command()
+@click.option("--job", "-j", "jobs", multiple=True, help="UNIT:YEAR, can be repeated.")
+@click.option("--unit", "-u", "units", multiple=True, help="All years of the unit.")
+@click.option("--all", "all_units", is_flag=True, help="All configured cities.")
+@click.option("--processes", "-p", default=1, show_default=True)
+@click.option("--incremental", is_flag=True, help="Skip stages with unchanged inputs.")
+@click.option("--no-save-jsons", is_flag=True, help="Do not save output/jsons.")
+def cli(jobs, units, all_units, processes, incremental, no_save_jsons):
+    selected = [parse_job(job) for job in jobs]
+    if units:
+        selected.extend(get_configured_jobs(list(units)))
+    if all_units:
+        selected.extend(get_configured_jobs())
+    if not selected:
+        raise click.UsageError("Pass --job, --unit or --all.")
+    selected = list(dict.fromkeys(selected))
+    results = run_batch(
+        selected,
+        processes=processes,
+        incremental=incremental,
+        save_jsons=not no_save_jsons,
+    )
+    click.echo(format_summary(results))
+    if any(result.status != "ok" for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    cli()
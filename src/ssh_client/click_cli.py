@@ -6,6 +6,8 @@ Provides convenient commands to:
 - list: list remote .pb files
 - upload: upload a file/dir/pattern of .pb files
 - upload-all: upload all .pb files from the local src/output directory
+- download-all: download .pb files from the server (concurrent transfers)
+- --sync (download-all, upload-all/-paths/-dirs): transfer only new or changed files
 
 Configuration priority (same as the ad-hoc CLI):
 1) src/ssh_client/.env (overrides)
@@ -19,6 +21,9 @@ Usage examples:
   python src/ssh_client/click_cli.py upload path/to/file.pb
   python src/ssh_client/click_cli.py upload path/to/dir --force
   python src/ssh_client/click_cli.py upload-all
+  python src/ssh_client/click_cli.py download-all --workers 8
+  python src/ssh_client/click_cli.py download-all --sync
+  python src/ssh_client/click_cli.py upload-all --sync --checksum
   python src/ssh_client/click_cli.py --host szufa list
   python src/ssh_client/click_cli.py --host szufa upload-all --container pabulib-web-1
 """
@@ -95,6 +100,15 @@ try:
         connect_from_env,
         connect_from_ssh_config,
     )
+    from ssh_client.sync import (
+        MANIFEST_NAME,
+        UPLOAD_MANIFEST_PATH,
+        SyncManifest,
+        plan_download_sync,
+        plan_upload_sync,
+        record_download,
+        record_upload,
+    )
 except Exception as e:
     click.echo(f"Error importing SSH client: {e}")
     sys.exit(1)
@@ -343,9 +357,34 @@ def upload_cmd(
     show_default=True,
     help="Recurse into subdirectories on the server",
 )
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(1, 10),
+    default=4,
+    show_default=True,
+    help="Concurrent transfers (SFTP channels)",
+)
+@click.option(
+    "--sync",
+    is_flag=True,
+    help="Transfer only new or changed files (size/mtime, local manifest)",
+)
+@click.option(
+    "--checksum",
+    is_flag=True,
+    help="With --sync, compare same-size files by sha256 before transferring",
+)
 @click.pass_context
 def download_all_cmd(
-    ctx: click.Context, directory: str, dest: Path, force: bool, recursive: bool
+    ctx: click.Context,
+    directory: str,
+    dest: Path,
+    force: bool,
+    recursive: bool,
+    workers: int,
+    sync: bool = False,
+    checksum: bool = False,
 ):
     """Download .pb files from the server to a local directory."""
     host = ctx.obj.get("host")
@@ -392,7 +431,7 @@ def download_all_cmd(
                 ]
 
             # Build download plan
-            plan: list[tuple[str, Path]] = []  # list of (remote_path, local_path)
+            plan: list[tuple[dict, Path]] = []  # list of (remote_info, local_path)
             preview: list[Path] = []
             for group_name, files, base_dir in groups:
                 sub_dest = dest if directory != "all" else dest / group_name
@@ -415,32 +454,62 @@ def download_all_cmd(
                             relpath = name
 
                     local_path = sub_dest / str(relpath)
-                    plan.append((str(remote_path), local_path))
+                    plan.append((info, local_path))
                     preview.append(local_path)
 
             if not plan:
                 _err("No files found to download")
                 raise SystemExit(1)
 
+            manifest = None
+            if sync:
+                manifest = SyncManifest(dest / MANIFEST_NAME)
+                with _silence_io():
+                    plan, unchanged = plan_download_sync(
+                        client, plan, manifest, checksum
+                    )
+                manifest.save()
+                click.echo(f"{len(unchanged)} files unchanged since last sync")
+                if not plan:
+                    click.echo("Everything is up to date.")
+                    return
+                preview = [local_path for _, local_path in plan]
+
             if not _preview_and_confirm_download(preview, dest):
                 click.echo("Aborted.")
                 return
 
-            # Execute downloads
-            ok = 0
-            for remote_path, local_path in plan:
-                res = client.download_file(remote_path, local_path, overwrite=force)
-                if res.get("ok"):
-                    size = res.get("size") or 0
-                    click.echo(
-                        f"  ↓ {local_path.name} ({(int(size) /(1024*1024)):.2f} MB)"
-                    )
-                    ok += 1
-                else:
-                    click.echo(f"  ✗ {local_path.name}: {res.get('error')}")
+            # Execute downloads, concurrently over several SFTP channels
+            total_bytes = sum(int(info.get("size") or 0) for info, _ in plan)
+            with click.progressbar(
+                length=total_bytes,
+                label=f"Downloading {len(plan)} files",
+                item_show_func=lambda name: name,
+            ) as bar:
+                stats = client.download_files(
+                    plan,
+                    workers=workers,
+                    overwrite=force or sync,
+                    progress=lambda info, res: bar.update(
+                        int(info.get("size") or 0), info.get("name")
+                    ),
+                )
 
-            click.echo(f"Completed: {ok}/{len(plan)} successful")
-            if ok != len(plan):
+            for (info, local_path), res in zip(plan, stats["results"]):
+                if not res.get("ok"):
+                    click.echo(f"  ✗ {local_path.name}: {res.get('error')}")
+                elif manifest is not None:
+                    record_download(manifest, info)
+            if manifest is not None:
+                manifest.save()
+            size_mb = int(stats["bytes"]) / (1024 * 1024)
+            seconds = float(stats["seconds"])
+            click.echo(
+                f"Completed: {stats['ok']}/{len(plan)} successful, "
+                f"{size_mb:.2f} MB in {seconds:.1f} s "
+                f"({size_mb / max(seconds, 1e-6):.2f} MB/s)"
+            )
+            if stats["ok"] != len(plan):
                 raise SystemExit(1)
     except SSHClientError as e:
         _err(str(e))
@@ -458,8 +527,24 @@ def download_all_cmd(
     default=None,
     help="Docker container name for Admin uploads",
 )
+@click.option(
+    "--sync",
+    is_flag=True,
+    help="Transfer only new or changed files (size/mtime, local manifest)",
+)
+@click.option(
+    "--checksum",
+    is_flag=True,
+    help="With --sync, compare same-size files by sha256 before transferring",
+)
 @click.pass_context
-def upload_all_cmd(ctx: click.Context, force: bool, container: Optional[str]):
+def upload_all_cmd(
+    ctx: click.Context,
+    force: bool,
+    container: Optional[str],
+    sync: bool = False,
+    checksum: bool = False,
+):
     """Upload all .pb files from the local src/output directory."""
     host = ctx.obj.get("host")
     container_name = _ensure_container(container)
@@ -472,6 +557,10 @@ def upload_all_cmd(ctx: click.Context, force: bool, container: Optional[str]):
         _err(f"No .pb files found in {DEFAULT_OUTPUT_DIR}")
         raise SystemExit(1)
 
+    if sync:
+        _sync_upload(host, files, container_name, checksum)
+        return
+
     if not _preview_and_confirm(files):
         click.echo("Aborted.")
         return
@@ -496,9 +585,24 @@ def upload_all_cmd(ctx: click.Context, force: bool, container: Optional[str]):
     default=None,
     help="Docker container name for Admin uploads",
 )
+@click.option(
+    "--sync",
+    is_flag=True,
+    help="Transfer only new or changed files (size/mtime, local manifest)",
+)
+@click.option(
+    "--checksum",
+    is_flag=True,
+    help="With --sync, compare same-size files by sha256 before transferring",
+)
 @click.pass_context
 def upload_paths_cmd(
-    ctx: click.Context, paths: tuple[str, ...], force: bool, container: Optional[str]
+    ctx: click.Context,
+    paths: tuple[str, ...],
+    force: bool,
+    container: Optional[str],
+    sync: bool = False,
+    checksum: bool = False,
 ):
     """Upload .pb files from one or more paths or glob patterns (no directories)."""
     host = ctx.obj.get("host")
@@ -533,6 +637,10 @@ def upload_paths_cmd(
         _err("No .pb files found to upload")
         raise SystemExit(1)
 
+    if sync:
+        _sync_upload(host, files, container_name, checksum)
+        return
+
     # Preview list
     if not _preview_and_confirm(files):
         click.echo("Aborted.")
@@ -558,9 +666,24 @@ def upload_paths_cmd(
     default=None,
     help="Docker container name for Admin uploads",
 )
+@click.option(
+    "--sync",
+    is_flag=True,
+    help="Transfer only new or changed files (size/mtime, local manifest)",
+)
+@click.option(
+    "--checksum",
+    is_flag=True,
+    help="With --sync, compare same-size files by sha256 before transferring",
+)
 @click.pass_context
 def upload_dirs_cmd(
-    ctx: click.Context, dirs: tuple[str, ...], force: bool, container: Optional[str]
+    ctx: click.Context,
+    dirs: tuple[str, ...],
+    force: bool,
+    container: Optional[str],
+    sync: bool = False,
+    checksum: bool = False,
 ):
     """Upload all .pb files from one or more directories."""
     host = ctx.obj.get("host")
@@ -583,6 +706,10 @@ def upload_dirs_cmd(
         _err("No .pb files found in the provided directories")
         raise SystemExit(1)
 
+    if sync:
+        _sync_upload(host, files, container_name, checksum)
+        return
+
     # Preview list
     if not _preview_and_confirm(files):
         click.echo("Aborted.")
@@ -640,8 +767,12 @@ def _upload_one(client, path: Path, container: str, force: bool) -> None:
         raise SystemExit(1)
 
 
-def _upload_many(client, files: list[Path], container: str, force: bool) -> None:
-    ok = 0
+def _upload_many(
+    client, files: list[Path], container: str, force: bool, check: bool = True
+) -> list[Path]:
+    """Upload files and return the uploaded ones. With `check`, exit with
+    status 1 if any upload failed."""
+    uploaded = []
     total = len(files)
     for f in files:
         r = client.upload_file_to_admin_in_container(
@@ -650,11 +781,54 @@ def _upload_many(client, files: list[Path], container: str, force: bool) -> None
         if r.get("ok"):
             size = r.get("size") or 0
             click.echo(f"  ✓ {f.name} ({size / (1024 * 1024):.2f} MB)")
-            ok += 1
+            uploaded.append(f)
         else:
             click.echo(f"  ✗ {f.name}: {r.get('error')}")
-    click.echo(f"Completed: {ok}/{total} successful")
-    if ok != total:
+    click.echo(f"Completed: {len(uploaded)}/{total} successful")
+    if check and len(uploaded) != total:
+        raise SystemExit(1)
+    return uploaded
+
+
+def _sync_upload(
+    host: Optional[str], files: list[Path], container: str, checksum: bool
+) -> None:
+    """Upload only new or changed files, see ssh_client/sync.py."""
+    manifest = SyncManifest(UPLOAD_MANIFEST_PATH)
+    try:
+        with _silent_ssh_client(host) as client:
+            dest_dir = client.container_upload_tmp_dir
+            with _silence_io():
+                to_upload, unchanged, _ = plan_upload_sync(
+                    client, files, manifest, container, dest_dir, checksum
+                )
+            manifest.save()
+            click.echo(f"{len(unchanged)} files unchanged since last sync")
+            if not to_upload:
+                click.echo("Everything is up to date.")
+                return
+            if not _preview_and_confirm(to_upload):
+                click.echo("Aborted.")
+                return
+            uploaded = _upload_many(client, to_upload, container, True, check=False)
+            if uploaded:
+                # one listing to record remote size/mtime of uploaded files
+                with _silence_io():
+                    remote_files = {
+                        info["name"]: info
+                        for info in client.list_admin_uploads_in_container(
+                            container, dest_dir
+                        )
+                    }
+                for path in uploaded:
+                    record_upload(
+                        manifest, client, container, dest_dir, path, remote_files
+                    )
+                manifest.save()
+            if len(uploaded) != len(to_upload):
+                raise SystemExit(1)
+    except SSHClientError as e:
+        _err(str(e))
         raise SystemExit(1)
 
 
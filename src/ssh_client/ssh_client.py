@@ -15,8 +15,12 @@ Notes
 """
 
 import os
+import queue
 import shlex
+import shutil
 import stat
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union
@@ -314,6 +318,7 @@ class SSHClient:
                             "name": fa.filename,
                             "size": fa.st_size,
                             "modified": datetime.fromtimestamp(fa.st_mtime),
+                            "mtime": fa.st_mtime,
                             "path": f"{remote_dir}/{fa.filename}",
                         }
                     )
@@ -371,7 +376,7 @@ class SSHClient:
         """
         Recursively walk a remote directory and collect .pb files with metadata.
 
-        Returns list with keys: name, size, modified, path
+        Returns list with keys: name, size, modified, mtime, path
         """
         self._ensure_connected()
         assert self._sftp is not None
@@ -403,6 +408,7 @@ class SSHClient:
                             "name": name,
                             "size": fa.st_size,
                             "modified": datetime.fromtimestamp(fa.st_mtime),
+                            "mtime": fa.st_mtime,
                             "path": full_path,
                         }
                     )
@@ -435,6 +441,7 @@ class SSHClient:
         local_path: Union[str, Path],
         overwrite: bool = False,
         preserve_mtime: bool = True,
+        remote_info: Optional[Dict[str, Union[str, int, datetime]]] = None,
     ) -> Dict[str, Union[bool, str, int]]:
         """
         Download a single remote file to a local path via SFTP.
@@ -444,13 +451,28 @@ class SSHClient:
             local_path: Destination local filepath
             overwrite: If False and local file exists, skip with error
             preserve_mtime: When True, preserve remote modification time
+            remote_info: Listing entry of the file (size, mtime); when given,
+                the remote file is not stat'ed
 
         Returns:
             Dict with keys: ok, error/message, local_path, size
         """
         self._ensure_connected()
         assert self._sftp is not None
+        return self._download_file(
+            self._sftp, remote_path, local_path, overwrite, preserve_mtime, remote_info
+        )
 
+    def _download_file(
+        self,
+        sftp: "paramiko.SFTPClient",
+        remote_path: str,
+        local_path: Union[str, Path],
+        overwrite: bool,
+        preserve_mtime: bool,
+        remote_info: Optional[Dict[str, Union[str, int, datetime]]],
+    ) -> Dict[str, Union[bool, str, int]]:
+        """Download a file over the given SFTP channel (see `download_file`)."""
         local_path = Path(local_path)
         local_path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -463,10 +485,25 @@ class SSHClient:
         # Download to a temp file first for atomicity, then rename
         tmp_path = local_path.with_suffix(local_path.suffix + ".part")
         try:
-            self._sftp.get(remote_path, str(tmp_path))
-            # Determine size and mtime from remote
-            st = self._sftp.stat(remote_path)
-            size = int(getattr(st, "st_size", 0) or 0)
+            if remote_info is None:
+                st = sftp.stat(remote_path)
+                size = int(getattr(st, "st_size", 0) or 0)
+                mtime = int(getattr(st, "st_mtime", 0) or 0)
+            else:
+                size = int(remote_info["size"])
+                mtime = int(remote_info["mtime"])
+
+            # Size is known, so reads are pipelined without another stat
+            with sftp.open(remote_path, "rb") as remote_file:
+                remote_file.prefetch(size)
+                with open(tmp_path, "wb") as local_file:
+                    shutil.copyfileobj(remote_file, local_file, 1024 * 1024)
+                    written = local_file.tell()
+            if written != size:
+                raise SSHClientError(
+                    f"size mismatch (remote {size} vs local {written}), "
+                    "file changed during download"
+                )
 
             # Move into place
             if local_path.exists():
@@ -478,7 +515,6 @@ class SSHClient:
 
             if preserve_mtime:
                 try:
-                    mtime = int(getattr(st, "st_mtime", 0) or 0)
                     os.utime(local_path, (mtime, mtime))
                 except Exception:
                     pass
@@ -498,6 +534,98 @@ class SSHClient:
                 pass
             return {"ok": False, "error": f"Failed to download: {e}"}
 
+    def download_files(
+        self,
+        plan: List[Tuple[Dict[str, Union[str, int, datetime]], Union[str, Path]]],
+        workers: int = 4,
+        overwrite: bool = False,
+        preserve_mtime: bool = True,
+        progress=None,
+    ) -> Dict[str, Union[int, float, list]]:
+        """
+        Download many files concurrently, over `workers` SFTP channels of the
+        existing SSH connection: the client's own channel and `workers - 1`
+        new ones (OpenSSH allows 10 sessions per connection by default). If
+        a channel cannot be opened, the channels opened so far are used.
+
+        Args:
+            plan: List of (remote_info, local_path), remote_info is a listing
+                entry (path, size, mtime), so files are not stat'ed again
+            workers: Number of concurrent transfers
+            overwrite: If False and local file exists, skip it with error
+            preserve_mtime: When True, preserve remote modification time
+            progress: Optional callback(remote_info, result), called after
+                every file from the calling thread
+
+        Returns:
+            Dict with keys: ok, failed, bytes, seconds, results (in plan order)
+        """
+        self._ensure_connected()
+        assert self._client is not None and self._sftp is not None
+        transport = self._client.get_transport()
+        workers = max(1, min(workers, len(plan)))
+        channels: "queue.Queue[paramiko.SFTPClient]" = queue.Queue()
+        opened = []
+        results: List[Optional[Dict[str, Union[bool, str, int]]]] = [None] * len(plan)
+        start = time.monotonic()
+
+        def transfer(item):
+            remote_info, local_path = item
+            sftp = channels.get()
+            try:
+                return self._download_file(
+                    sftp,
+                    str(remote_info["path"]),
+                    local_path,
+                    overwrite,
+                    preserve_mtime,
+                    remote_info,
+                )
+            finally:
+                channels.put(sftp)
+
+        channels.put(self._sftp)
+        for _ in range(workers - 1):
+            try:
+                sftp = paramiko.SFTPClient.from_transport(transport)
+            except (paramiko.SSHException, EOFError):
+                sftp = None
+            if sftp is None:
+                # e.g. server limit of sessions per connection reached
+                break
+            opened.append(sftp)
+            channels.put(sftp)
+        workers = len(opened) + 1
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(transfer, item): idx
+                    for idx, item in enumerate(plan)
+                }
+                for future in as_completed(futures):
+                    idx = futures[future]
+                    results[idx] = future.result()
+                    if progress is not None:
+                        progress(plan[idx][0], results[idx])
+        except Exception as e:
+            raise SSHClientError(f"Failed to download files: {str(e)}")
+        finally:
+            for sftp in opened:
+                try:
+                    sftp.close()
+                except Exception:
+                    pass
+
+        done = [result for result in results if result and result.get("ok")]
+        return {
+            "ok": len(done),
+            "failed": len(plan) - len(done),
+            "bytes": sum(int(result.get("size") or 0) for result in done),
+            "seconds": time.monotonic() - start,
+            "results": results,
+        }
+
     def get_file_info(
         self, filename: str, directory: str = "pb_files"
     ) -> Optional[Dict[str, Union[str, int, datetime]]]:
@@ -559,6 +687,38 @@ class SSHClient:
         except Exception as e:
             raise SSHClientError(f"Failed to execute command '{command}': {str(e)}")
 
+    def sha256sums(
+        self, paths: List[str], container: Optional[str] = None
+    ) -> Dict[str, str]:
+        """
+        Compute sha256 of remote files with batched `sha256sum` commands (one
+        command unless arguments exceed ~100 kB), inside `container` if given.
+
+        Returns:
+            Dict of remote path -> hex digest, missing files are left out
+        """
+        batches: List[List[str]] = []
+        length = 0
+        for path in paths:
+            if not batches or length > 100_000:
+                batches.append([])
+                length = 0
+            batches[-1].append(path)
+            length += len(path) + 3
+
+        hashes: Dict[str, str] = {}
+        for batch in batches:
+            command = "sha256sum -- " + " ".join(shlex.quote(p) for p in batch)
+            if container:
+                command = f"docker exec -i {shlex.quote(container)} sh -lc {shlex.quote(command)}"
+            # exit code is non-zero if any file is missing, others are printed
+            out, _, _ = self.execute_command(command)
+            for line in out.splitlines():
+                digest, _, path = line.partition("  ")
+                if len(digest) == 64 and path:
+                    hashes[path] = digest
+        return hashes
+
     def _docker_exec_stream_file(
         self, container: str, dest_path: str, local_path: Path
     ) -> Tuple[bool, str]:
@@ -729,7 +889,7 @@ class SSHClient:
     ) -> List[Dict[str, Union[str, int, datetime]]]:
         """
         List .pb files inside the container's admin upload directory.
-        Returns a list of dicts: name, size, modified (when available), path.
+        Returns a list of dicts: name, size, modified and mtime (when available), path.
         """
         self._ensure_connected()
 
@@ -767,9 +927,11 @@ class SSHClient:
             except Exception:
                 size = 0
             modified_dt: Optional[datetime] = None
+            mtime: Optional[int] = None
             if len(parts) >= 3 and parts[2].strip():
                 try:
-                    modified_dt = datetime.fromtimestamp(int(float(parts[2].strip())))
+                    mtime = int(float(parts[2].strip()))
+                    modified_dt = datetime.fromtimestamp(mtime)
                 except Exception:
                     modified_dt = None
             info: Dict[str, Union[str, int, datetime]] = {
@@ -779,6 +941,7 @@ class SSHClient:
             }
             if modified_dt is not None:
                 info["modified"] = modified_dt
+                info["mtime"] = mtime
             files.append(info)
 
         return sorted(files, key=lambda x: x["name"]) if files else []
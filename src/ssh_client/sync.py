@@ -0,0 +1,183 @@
+"""
+Incremental sync of .pb files between the server and local directories.
+
+A local JSON manifest remembers size and mtime of files transferred in
+previous runs (keyed by remote path), so a sync needs one listing call and
+transfers only new or changed files. With `checksum=True`, files whose size
+is the same but mtime changed are compared by sha256 first (remote hashes
+come from one batched `sha256sum` call), so touched but identical files are
+not transferred again.
+
+Usage (see `download-all --sync` and `upload-all --sync` in click_cli.py):
+
+    manifest = SyncManifest(dest / MANIFEST_NAME)
+    to_download, unchanged = plan_download_sync(client, plan, manifest)
+    ... download `to_download`, `record_download` every downloaded file ...
+    manifest.save()
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+# manifest of downloads, kept in the destination directory
+MANIFEST_NAME = ".pb_sync_manifest.json"
+# manifest of uploads into the container (keys contain host and container)
+UPLOAD_MANIFEST_PATH = Path(__file__).resolve().parent / ".upload_sync_manifest.json"
+
+
+def file_sha256(path: Union[str, Path]) -> str:
+    """Hex sha256 of a local file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _local_size_mtime(path: Union[str, Path]) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_size, int(st.st_mtime)
+
+
+class SyncManifest:
+    """Size / mtime of transferred files, saved as JSON."""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        try:
+            self.entries: Dict[str, Dict] = json.loads(self.path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.entries.get(key)
+
+    def update(self, key: str, **entry) -> None:
+        self.entries[key] = entry
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".part")
+        tmp_path.write_text(json.dumps(self.entries, indent=1, sort_keys=True))
+        tmp_path.replace(self.path)
+
+
+def plan_download_sync(
+    client, plan: List[Tuple[Dict, Path]], manifest: SyncManifest, checksum=False
+) -> Tuple[List[Tuple[Dict, Path]], List[Tuple[Dict, Path]]]:
+    """
+    Split download plan (remote_info, local_path) into (to_download, unchanged).
+
+    A file is unchanged if the manifest has its remote size / mtime from the
+    listing and the local file still has them (downloads preserve mtime).
+    """
+    to_download, unchanged, same_size = [], [], []
+    for info, local_path in plan:
+        remote = (int(info["size"]), int(info["mtime"]))
+        entry = manifest.get(str(info["path"]))
+        local = _local_size_mtime(local_path)
+        if entry and (entry["size"], entry["mtime"]) == remote == local:
+            unchanged.append((info, local_path))
+        elif checksum and local and local[0] == remote[0]:
+            same_size.append((info, local_path))
+        else:
+            to_download.append((info, local_path))
+
+    if same_size:
+        remote_hashes = client.sha256sums([str(info["path"]) for info, _ in same_size])
+        for info, local_path in same_size:
+            if remote_hashes.get(str(info["path"])) == file_sha256(local_path):
+                mtime = int(info["mtime"])
+                os.utime(local_path, (mtime, mtime))
+                record_download(manifest, info)
+                unchanged.append((info, local_path))
+            else:
+                to_download.append((info, local_path))
+    return to_download, unchanged
+
+
+def record_download(manifest: SyncManifest, info: Dict) -> None:
+    manifest.update(str(info["path"]), size=int(info["size"]), mtime=int(info["mtime"]))
+
+
+def upload_key(client, container: str, remote_path: str) -> str:
+    return f"{client.host}:{container}:{remote_path}"
+
+
+def plan_upload_sync(
+    client,
+    files: List[Path],
+    manifest: SyncManifest,
+    container: str,
+    dest_dir: Optional[str] = None,
+    checksum=False,
+) -> Tuple[List[Path], List[Path], Dict[str, Dict]]:
+    """
+    Split local files into (to_upload, unchanged) using one listing of the
+    container upload directory, which is returned as well (name -> info).
+
+    A file is unchanged if the remote file still has size / mtime recorded
+    after the last upload and the local file has not changed since.
+    """
+    dest_dir = (dest_dir or client.container_upload_tmp_dir).rstrip("/")
+    remote_files = {
+        info["name"]: info
+        for info in client.list_admin_uploads_in_container(container, dest_dir)
+    }
+    to_upload, unchanged, same_size = [], [], []
+    for path in files:
+        remote = remote_files.get(path.name)
+        entry = manifest.get(upload_key(client, container, f"{dest_dir}/{path.name}"))
+        local = _local_size_mtime(path)
+        if (
+            remote
+            and entry
+            and (entry["local_size"], entry["local_mtime"]) == local
+            and (entry["remote_size"], entry["remote_mtime"])
+            == (remote["size"], remote.get("mtime"))
+        ):
+            unchanged.append(path)
+        elif checksum and remote and local and remote["size"] == local[0]:
+            same_size.append(path)
+        else:
+            to_upload.append(path)
+
+    if same_size:
+        remote_hashes = client.sha256sums(
+            [f"{dest_dir}/{path.name}" for path in same_size], container=container
+        )
+        for path in same_size:
+            if remote_hashes.get(f"{dest_dir}/{path.name}") == file_sha256(path):
+                record_upload(manifest, client, container, dest_dir, path, remote_files)
+                unchanged.append(path)
+            else:
+                to_upload.append(path)
+    return to_upload, unchanged, remote_files
+
+
+def record_upload(
+    manifest: SyncManifest,
+    client,
+    container: str,
+    dest_dir: str,
+    path: Path,
+    remote_files: Dict[str, Dict],
+) -> None:
+    """Record uploaded file, `remote_files` is a listing made after upload."""
+    remote = remote_files.get(path.name)
+    local = _local_size_mtime(path)
+    if not remote or not local:
+        return
+    manifest.update(
+        upload_key(client, container, f"{dest_dir.rstrip('/')}/{path.name}"),
+        local_size=local[0],
+        local_mtime=local[1],
+        remote_size=remote["size"],
+        remote_mtime=remote.get("mtime"),
+    )
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# modules are imported as in scripts run from src/ (e.g. `helpers.tally`)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
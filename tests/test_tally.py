@@ -0,0 +1,41 @@
+import numpy as np
+
+from helpers import tally
+
+VOTES = {
+    "1": {"vote": "A,B,C", "points": "5,3,1", "vote_strength": "2"},
+    "2": {"vote": "C,A"},
+    "3": {"vote": "B", "points": "4"},
+    "4": {"vote": ""},
+    "5": {"vote": "A,C", "vote_strength": ""},
+}
+
+
+def test_points_and_strength_are_aligned_with_voters():
+    ballots = tally.encode_ballots(VOTES, ["A", "B", "C"])
+
+    # voters without points get points based on vote length
+    assert ballots.points.tolist() == [5, 3, 1, 2, 1, 4, 2, 1]
+    assert len(ballots.points) == len(ballots.vote_indices)
+    # empty or missing strength is 1
+    assert ballots.vote_strength.tolist() == [2, 1, 1, 1, 1]
+    assert len(ballots.vote_strength) == ballots.num_votes
+
+
+def test_points_are_not_weighted_by_vote_strength():
+    ballots = tally.encode_ballots(VOTES, ["A", "B", "C"])
+
+    counted_votes = tally.to_counter(ballots, tally.approval_counts(ballots))
+    counted_points = tally.to_counter(ballots, tally.points_per_project(ballots))
+
+    assert counted_votes == {"A": 4, "B": 3, "C": 4}
+    assert counted_points == {"A": 5 + 1 + 2, "B": 3 + 4, "C": 1 + 2 + 1}
+
+
+def test_ordinal_scores_without_points():
+    votes = {"1": {"vote": "A,B,C"}, "2": {"vote": "C", "vote_strength": "3"}}
+    ballots = tally.encode_ballots(votes, ["A", "B", "C"])
+
+    assert ballots.points is None
+    assert np.array_equal(tally.points_per_project(ballots), [3, 2, 2])
+    assert np.array_equal(tally.approval_counts(ballots), [1, 1, 4])